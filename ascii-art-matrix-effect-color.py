@@ -1,9 +1,11 @@
-from typing import List, Tuple
+from typing import Dict, Iterable, Iterator, List, Tuple
 
-import cv2
 import numpy as np
 from PIL import Image
 
+from ascii_engine import draft_for_size
+from matrix_effect import SPACE, GlyphAtlas, GlyphCanvas, advance_flows, apply_delta, flow_masks, frame_delta, glyph_grid, play_in_terminal, random_glyphs, write_video
+
 ASCII_CHARS: List[str] = [".", ":", ">", "&", "%", "#", "N", "M", "W", "R", "B"]
 
 
@@ -11,7 +13,9 @@ def scale_image(image: Image.Image, new_width: int = 100) -> Image.Image:
     (original_width, original_height) = image.size
     aspect_ratio: float = original_height / float(original_width)
     new_height: int = int(aspect_ratio * new_width)
-    new_image: Image.Image = image.resize((new_width, new_height))
+    # a freshly opened JPEG is decoded at a reduced scale when the target is much smaller
+    box, reducing_gap = draft_for_size(image, (new_width, new_height))
+    new_image: Image.Image = image.resize((new_width, new_height), box=box, reducing_gap=reducing_gap)
     return new_image
 
 
@@ -26,6 +30,7 @@ def map_pixels_to_ascii_chars(image: Image.Image, range_width: int = 25) -> str:
 
 
 def convert_image_to_ascii(image: Image.Image, new_width: int = 100) -> Tuple[str, List[Tuple[int, int, int, int]]]:
+    # not streamed strip by strip: the matrix effect animates the whole grid and its colors, so every line is held anyway
     image = scale_image(image, new_width)
     grayscale_image = convert_to_grayscale(image)
     pixels_to_chars: str = map_pixels_to_ascii_chars(grayscale_image)
@@ -35,45 +40,30 @@ def convert_image_to_ascii(image: Image.Image, new_width: int = 100) -> Tuple[st
     return "\n".join(image_ascii), color_data
 
 
-def get_char_for_position(x, y, lines, column_states, column_lengths):
-    if x >= len(lines[y]):
-        return " "  # Pad shorter lines with spaces
-    if column_states[x] == -1 or column_states[x] < y:
-        return lines[y][x]
-    if column_states[x] - column_lengths[x] <= y:
-        if column_states[x] == y:
-            return " "
-        else:
-            return chr(np.random.choice(list(range(33, 127))))  # Random ASCII characters excluding space
-    return lines[y][x]
-
-
-def generate_new_frame(lines, column_states, column_lengths, height, width):
-    new_frame = []
-    for y in range(height):
-        new_line = "".join(get_char_for_position(x, y, lines, column_states, column_lengths) for x in range(width))
-        new_frame.append(new_line)
-    return new_frame
-
-
-def update_column_states(column_states, column_lengths, columns_covered, height, width):
-    # Move the flow down faster
-    column_states = [state + 2 if state != -1 else state for state in column_states]
-    # Reset the flow if it reaches the bottom and mark columns as covered
-    for i in range(width):
-        if column_states[i] >= height + column_lengths[i]:
-            column_states[i] = -1
-            columns_covered[i] = True  # Mark this column as covered
+def generate_new_frame(glyphs: np.ndarray, column_states: np.ndarray, column_lengths: np.ndarray) -> np.ndarray:
+    # the head of a flow is marked with a space, the rest of its trail shows random characters
+    head, trail = flow_masks(column_states, glyphs.shape[0], column_lengths)
+    drawable = glyphs != SPACE  # padding of shorter lines stays blank
+    trail &= drawable
+    frame = glyphs.copy()
+    frame[trail] = random_glyphs(np.count_nonzero(trail))
+    frame[head & drawable] = SPACE
+    return frame
+
+
+def update_column_states(column_states: np.ndarray, column_lengths: np.ndarray, columns_covered: np.ndarray, height: int) -> Tuple[np.ndarray, np.ndarray]:
+    # Move the flow down faster, reset it if it reaches the bottom and mark the column as covered
+    columns_covered |= advance_flows(column_states, column_lengths, height)
     return column_states, columns_covered
 
 
-def start_new_flows(column_states, column_lengths, columns_covered, height, width, t, skip_frames):
+def start_new_flows(column_states: np.ndarray, column_lengths: np.ndarray, columns_covered: np.ndarray, height: int, width: int, t: int, skip_frames: int) -> Tuple[np.ndarray, np.ndarray]:
     if t >= skip_frames:
-        active_flows = sum(1 for state in column_states if state != -1)
+        active_flows = np.count_nonzero(column_states != -1)
         if active_flows < width:
             # Ensure all columns are eventually covered
-            uncovered_columns = [i for i, covered in enumerate(columns_covered) if not covered]
-            if uncovered_columns:
+            uncovered_columns = np.flatnonzero(~columns_covered)
+            if len(uncovered_columns):
                 i = np.random.choice(uncovered_columns)
             else:
                 i = np.random.randint(0, width)
@@ -83,94 +73,125 @@ def start_new_flows(column_states, column_lengths, columns_covered, height, widt
     return column_states, column_lengths
 
 
-def generate_matrix_effect(image_ascii: str) -> List[str]:
-    lines = image_ascii.split("\n")
-    height = len(lines)
-    width = max(len(line) for line in lines)  # Ensure all lines have the same width
-    frames = []
+def generate_matrix_effect(image_ascii: str) -> Iterator[Tuple[np.ndarray, np.ndarray]]:
+    # Yields each frame as the cells that changed since the previous one
+    glyphs = glyph_grid(image_ascii)  # Pads all lines to the same width
+    height, width = glyphs.shape
+    previous = np.full((height, width), SPACE, dtype=np.uint8)  # the first frame is a change from a blank grid
 
-    column_states = [-1] * width  # -1 means no flow
-    column_lengths = [0] * width
-    columns_covered = [False] * width  # Track which columns have been covered by the flow
+    column_states = np.full(width, -1, dtype=np.int64)  # -1 means no flow
+    column_lengths = np.zeros(width, dtype=np.int64)
+    columns_covered = np.zeros(width, dtype=bool)  # Track which columns have been covered by the flow
 
     # Skip the first second (assuming 30 FPS, skip the first 30 frames)
     skip_frames = 30
     t = 0
 
-    while not all(columns_covered):
-        new_frame = generate_new_frame(lines, column_states, column_lengths, height, width)
-        frames.append("\n".join(new_frame))
-        column_states, columns_covered = update_column_states(column_states, column_lengths, columns_covered, height, width)
+    while not columns_covered.all():
+        yield frame_delta(previous, generate_new_frame(glyphs, column_states, column_lengths))
+        column_states, columns_covered = update_column_states(column_states, column_lengths, columns_covered, height)
         column_states, column_lengths = start_new_flows(column_states, column_lengths, columns_covered, height, width, t, skip_frames)
         t += 1
 
     # Add 1 second of additional frames after all columns are covered
     additional_frames = 30
-    frames.extend([frames[-1]] * additional_frames)
+    unchanged = (np.empty(0, dtype=np.int64), np.empty(0, dtype=np.uint8))
+    for _ in range(additional_frames):
+        yield unchanged
+
 
-    return frames
+def build_palette(color_data: List[Tuple[int, int, int, int]], shape: Tuple[int, int]) -> Tuple[np.ndarray, np.ndarray]:
+    # Palette: flow green, the lighter head color, then every distinct image color, all in BGR
+    height, width = shape
+    colors = np.array([(0, 255, 0, 255)] * (height * width), dtype=np.uint8)
+    colors[: len(color_data)] = np.array(color_data[: height * width], dtype=np.uint8).reshape(-1, 4)
+    colors[colors[:, 3] == 0] = (50, 50, 50, 255)  # Convert transparent pixels to dark gray
+    image_colors, image_color_indices = np.unique(colors[:, 2::-1], axis=0, return_inverse=True)
+    palette = np.vstack([[(0, 255, 0), (200, 255, 200)], image_colors]).astype(np.uint8)
+    return palette, image_color_indices.reshape(height, width) + 2
 
 
-def create_video_from_frames(frames: List[str], color_data: List[Tuple[int, int, int, int]], width: int, output_path: str):
-    height = len(frames[0].split("\n"))
-    fourcc = cv2.VideoWriter_fourcc(*"mp4v")
-    frame_rate = 30
-    video = cv2.VideoWriter(output_path, fourcc, frame_rate, (width * 10, height * 10))
+def colorize_frames(frame_deltas: Iterable[Tuple[np.ndarray, np.ndarray]], image_color_indices: np.ndarray) -> Iterator[Tuple[np.ndarray, np.ndarray]]:
+    # Yields the characters to draw and their palette index for every frame
+    ascii_chars = np.zeros(256, dtype=bool)
+    ascii_chars[[ord(char) for char in ASCII_CHARS]] = True
 
     # Track which characters have been part of the flow
-    flow_passed = [[False] * width for _ in range(height)]
+    flow_passed = np.zeros(image_color_indices.shape, dtype=bool)
+
+    frame = np.full(image_color_indices.shape, SPACE, dtype=np.uint8)
+
+    for delta in frame_deltas:
+        glyphs = apply_delta(frame, delta).copy()
+        image_chars = ascii_chars[glyphs]
+        heads = glyphs == SPACE  # Head of the flow
+        flow_passed |= ~image_chars & ~heads  # Mark the flow's characters
+
+        # image characters keep their color, heads get a random lighter character, the flow turns green
+        color_indices = np.where(image_chars, image_color_indices, heads.astype(np.int64))
+        color_indices[flow_passed] = 0
+        glyphs[heads] = random_glyphs(np.count_nonzero(heads))
+
+        yield glyphs, color_indices
 
-    for frame in frames:
-        img = np.zeros((height * 10, width * 10, 3), dtype=np.uint8)
-        for y, line in enumerate(frame.split("\n")):
-            for x, char in enumerate(line):
-                color = color_data[y * width + x] if y * width + x < len(color_data) else (0, 255, 0, 255)
-                if color[3] == 0:  # Handle transparency
-                    color = (50, 50, 50, 255)  # Convert transparent pixels to dark gray
 
-                if char in ASCII_CHARS:
-                    color = (color[2], color[1], color[0])  # Convert RGBA to BGR
-                elif char == " ":  # Head of the flow
-                    char = chr(np.random.choice(list(range(33, 127))))  # Random ASCII characters excluding space
-                    color = (200, 255, 200)  # Lighter color for the first character of the flow
-                else:
-                    color = (0, 255, 0)  # Green color for the flow
-                    flow_passed[y][x] = True  # Mark this character as part of the flow
+def create_video_from_frames(frame_deltas: Iterable[Tuple[np.ndarray, np.ndarray]], color_data: List[Tuple[int, int, int, int]], shape: Tuple[int, int], output_path: str, workers: int = 1):
+    palette, image_color_indices = build_palette(color_data, shape)
+    canvas = GlyphCanvas(GlyphAtlas(palette), shape, workers)
 
-                # If the flow has passed, turn the character green
-                if flow_passed[y][x]:
-                    color = (0, 255, 0)
+    # only changed cells are redrawn, the frames are encoded on a writer thread while the next ones are drawn
+    images = (canvas.update(glyphs, color_indices) for glyphs, color_indices in colorize_frames(frame_deltas, image_color_indices))
+    try:
+        write_video(images, output_path, frame_rate=30)
+    finally:
+        canvas.close()
 
-                cv2.putText(img, char, (x * 10, y * 10 + 10), cv2.FONT_HERSHEY_PLAIN, 1, color, 1)
-        video.write(img)
 
-    video.release()
+def play_frames_in_terminal(frame_deltas: Iterable[Tuple[np.ndarray, np.ndarray]], color_data: List[Tuple[int, int, int, int]], shape: Tuple[int, int], frame_rate: int = 30) -> Dict[str, float]:
+    # Plays the effect in a truecolor terminal instead of writing a video
+    palette, image_color_indices = build_palette(color_data, shape)
+    return play_in_terminal(colorize_frames(frame_deltas, image_color_indices), palette[:, ::-1], shape, frame_rate)
 
 
 if __name__ == "__main__":
+    import os
     import sys
 
-    image_file_path: str = sys.argv[1]
+    # --terminal plays the effect in the terminal instead of writing a video
+    terminal = "--terminal" in sys.argv
+    arguments = [argument for argument in sys.argv[1:] if argument != "--terminal"]
+    image_file_path: str = arguments[0]
+    workers: int = int(arguments[1]) if len(arguments) > 1 else min(4, os.cpu_count() or 1)
     new_width = 100
 
     image = Image.open(image_file_path)
     image_ascii, color_data = convert_image_to_ascii(image, new_width)
-    frames = generate_matrix_effect(image_ascii)
-    create_video_from_frames(frames, color_data, new_width, "ascii-art-matrix-effect-color.mp4")
+    frame_deltas = generate_matrix_effect(image_ascii)
+    shape = glyph_grid(image_ascii).shape
+    if terminal:
+        stats = play_frames_in_terminal(frame_deltas, color_data, shape)
+        # the status line showed the bytes per frame while playing, this sums up the whole run
+        print(f"{stats['frames']} frames shown, {stats['dropped']} dropped, {stats['bytes_per_frame']:.0f} bytes per frame on average, {stats['max_frame_bytes']} at most")
+    else:
+        create_video_from_frames(frame_deltas, color_data, shape, "ascii-art-matrix-effect-color.mp4", workers)
 """
 Feature:
     Generate a MP4 video with matrix effect from ascii-art of an image file.
     Gradually turning the coloured characters green as the "flow" passes through them.
 
 Usage:
-    python3 ascii-art-matrix-effect-color.py <image_file_path>
+    python3 ascii-art-matrix-effect-color.py <image_file_path> <workers>
+    python3 ascii-art-matrix-effect-color.py <image_file_path> --terminal
 
 Args:
     image_file_path: str - Path to the image file.
+    workers: int - Threads drawing the frames (optional, default: number of CPUs, at most 4).
 
 Example:
     python3 ascii-art-matrix-effect-color.py example/ztm-logo.png
+    python3 ascii-art-matrix-effect-color.py example/ztm-logo.png --terminal
 
 Output file:
-    ascii-art-matrix-effect-color.mp4
+    ascii-art-matrix-effect-color.mp4, or truecolor playback in the terminal with --terminal
+    (a status line below the art shows the bytes sent per frame while it plays, a summary follows at the end)
 """
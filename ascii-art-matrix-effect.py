@@ -1,10 +1,13 @@
+import os
 import sys
-from typing import List
+from typing import Dict, Iterable, Iterator, List, Optional, Tuple
 
-import cv2
 import numpy as np
 from PIL import Image
 
+from ascii_engine import draft_for_size
+from matrix_effect import SPACE, GlyphAtlas, GlyphCanvas, advance_flows, apply_delta, flow_masks, frame_delta, glyph_grid, play_in_terminal, random_glyphs, write_video
+
 ASCII_CHARS: List[str] = ["#", "?", "%", ".", "S", "+", ".", "*", ":", ",", "@"]
 
 
@@ -12,7 +15,9 @@ def scale_image(image: Image.Image, new_width: int = 100) -> Image.Image:
     (original_width, original_height) = image.size
     aspect_ratio: float = original_height / float(original_width)
     new_height: int = int(aspect_ratio * new_width)
-    return image.resize((new_width, new_height))
+    # a freshly opened JPEG is decoded at a reduced scale when the target is much smaller
+    box, reducing_gap = draft_for_size(image, (new_width, new_height))
+    return image.resize((new_width, new_height), box=box, reducing_gap=reducing_gap)
 
 
 def convert_to_grayscale(image: Image.Image) -> Image.Image:
@@ -26,6 +31,7 @@ def map_pixels_to_ascii_chars(image: Image.Image, range_width: int = 25) -> str:
 
 
 def convert_image_to_ascii(image: Image.Image, new_width: int = 100) -> str:
+    # not streamed strip by strip: the matrix effect animates the whole grid, so every line is held anyway
     image = scale_image(image, new_width)
     image = convert_to_grayscale(image)
     pixels_to_chars: str = map_pixels_to_ascii_chars(image)
@@ -33,95 +39,90 @@ def convert_image_to_ascii(image: Image.Image, new_width: int = 100) -> str:
     return "\n".join([pixels_to_chars[index : index + new_width] for index in range(0, len_pixels_to_chars, new_width)])
 
 
-def generate_new_frame(image_ascii: str, column_states: List[int], height: int, width: int) -> str:
+def generate_new_frame(glyphs: np.ndarray, column_states: np.ndarray) -> np.ndarray:
     """Generates a new frame based on the current column states."""
-    new_frame = []
-    lines = image_ascii.split("\n")
-
-    for y in range(height):
-        new_line = ""
-        for x in range(width):
-            if x >= len(lines[y]):
-                new_line += " "  # Pad shorter lines with spaces
-            elif column_states[x] == -1:
-                new_line += lines[y][x]
-            elif column_states[x] < y:
-                new_line += lines[y][x]
-            else:
-                new_line += chr(np.random.choice(list(range(33, 127))))  # Random ASCII character
-        new_frame.append(new_line)
-
-    return "\n".join(new_frame)
-
-
-def update_column_states(column_states: List[int], height: int, column_lengths: List[int]):
-    """Updates the column states and resets them if they reach the bottom."""
-    for i in range(len(column_states)):
-        if column_states[i] >= height + column_lengths[i]:
-            column_states[i] = -1
+    # every cell from the top down to a flow's head shows a random character, padding stays blank
+    _, trail = flow_masks(column_states, glyphs.shape[0])
+    trail &= glyphs != SPACE
+    frame = glyphs.copy()
+    frame[trail] = random_glyphs(np.count_nonzero(trail))
+    return frame
+
+
+def update_column_states(column_states: np.ndarray, height: int, column_lengths: np.ndarray) -> np.ndarray:
+    """Moves the flows down and resets them if they reach the bottom."""
+    advance_flows(column_states, column_lengths, height)
     return column_states
 
 
-def generate_matrix_effect(image_ascii: str, frame_count: int) -> List[str]:
-    """Generates frames for the matrix effect."""
-    lines = image_ascii.split("\n")
-    height = len(lines)
-    width = max(len(line) for line in lines)
-    frames = []
+def generate_matrix_effect(image_ascii: str, frame_count: int) -> Iterator[Tuple[np.ndarray, np.ndarray]]:
+    """Generates the frames of the matrix effect one by one, as the cells that changed since the previous frame."""
+    glyphs = glyph_grid(image_ascii)
+    height, width = glyphs.shape
+    previous = np.full((height, width), SPACE, dtype=np.uint8)  # the first frame is a change from a blank grid
     flow_count = width
 
-    column_states = [-1] * width  # -1 means no flow
-    column_lengths = [0] * width
+    column_states = np.full(width, -1, dtype=np.int64)  # -1 means no flow
+    column_lengths = np.zeros(width, dtype=np.int64)
 
     # Skip the first second (assuming 30 FPS, skip the first 30 frames)
     skip_frames = 30
 
     for t in range(frame_count):
-        new_frame = generate_new_frame(image_ascii, column_states, height, width)
-        frames.append(new_frame)
+        new_frame = generate_new_frame(glyphs, column_states)
+        yield frame_delta(previous, new_frame)
 
-        column_states = [state + 2 if state != -1 else state for state in column_states]  # Move the flow down faster
         column_states = update_column_states(column_states, height, column_lengths)
 
         # Randomly select columns to start new flows if the number of active flows is less than flow_count
-        if t >= skip_frames and sum(state != -1 for state in column_states) < flow_count and np.random.rand() < 0.8:
+        if t >= skip_frames and np.count_nonzero(column_states != -1) < flow_count and np.random.rand() < 0.8:
             i = np.random.randint(0, width)
             if column_states[i] == -1:
                 column_states[i] = 0
                 column_lengths[i] = np.random.randint(int(0.2 * height), int(1.2 * height))  # Random length
 
-    return frames
-
 
-def create_video_from_frames(frames: List[str], output_path: str):
-    """Creates a video from ASCII frames."""
-    height = len(frames[0].split("\n"))
-    width = len(frames[0].split("\n")[0])
-    fourcc = cv2.VideoWriter_fourcc(*"mp4v")
-    frame_rate = 30
-    video = cv2.VideoWriter(output_path, fourcc, frame_rate, (width * 10, height * 10))
+def create_video_from_frames(frame_deltas: Iterable[Tuple[np.ndarray, np.ndarray]], shape: Tuple[int, int], output_path: str, frame_count: Optional[int] = None, workers: int = 1):
+    """Creates a video from ASCII frame deltas, drawing on worker threads while a writer thread encodes."""
+    # every character is green; spaces draw nothing, so they need no color of their own
+    canvas = GlyphCanvas(GlyphAtlas([(0, 255, 0)]), shape, workers)
+    glyphs = np.full(shape, SPACE, dtype=np.uint8)
 
-    for frame in frames:
-        img = np.zeros((height * 10, width * 10, 3), dtype=np.uint8)
-        for y, line in enumerate(frame.split("\n")):
-            for x, char in enumerate(line):
-                color = (0, 255, 0) if char != " " else (200, 255, 200)  # Color for the character
-                cv2.putText(img, char, (x * 10, y * 10 + 10), cv2.FONT_HERSHEY_PLAIN, 1, color, 1)
+    # only changed cells are redrawn, the frames are encoded while the next ones are drawn
+    images = (canvas.update(apply_delta(glyphs, delta), 0) for delta in frame_deltas)
+    try:
+        write_video(images, output_path, frame_rate=30, total=frame_count)
+    finally:
+        canvas.close()
 
-        video.write(img)
 
-    video.release()
+def play_frames_in_terminal(frame_deltas: Iterable[Tuple[np.ndarray, np.ndarray]], shape: Tuple[int, int], frame_rate: int = 30) -> Dict[str, float]:
+    """Plays the ASCII frame deltas in the terminal instead of writing a video."""
+    glyphs = np.full(shape, SPACE, dtype=np.uint8)
+    color_indices = np.zeros(shape, dtype=np.int64)  # everything is green
+    frames = ((apply_delta(glyphs, delta), color_indices) for delta in frame_deltas)
+    return play_in_terminal(frames, [(0, 255, 0)], shape, frame_rate)
 
 
 if __name__ == "__main__":
-    image_file_path: str = sys.argv[1]
-    frame_count: int = int(sys.argv[2]) if len(sys.argv) > 2 else 500
+    # --terminal plays the effect in the terminal instead of writing a video
+    terminal = "--terminal" in sys.argv
+    arguments = [argument for argument in sys.argv[1:] if argument != "--terminal"]
+    image_file_path: str = arguments[0]
+    frame_count: int = int(arguments[1]) if len(arguments) > 1 else 500
+    workers: int = int(arguments[2]) if len(arguments) > 2 else min(4, os.cpu_count() or 1)
     new_width = 100
 
     image = Image.open(image_file_path)
     image_ascii = convert_image_to_ascii(image, new_width)
-    frames = generate_matrix_effect(image_ascii, frame_count)
-    create_video_from_frames(frames, "ascii-art-matrix-effect.mp4")
+    frame_deltas = generate_matrix_effect(image_ascii, frame_count)
+    shape = glyph_grid(image_ascii).shape
+    if terminal:
+        stats = play_frames_in_terminal(frame_deltas, shape)
+        # the status line showed the bytes per frame while playing, this sums up the whole run
+        print(f"{stats['frames']} frames shown, {stats['dropped']} dropped, {stats['bytes_per_frame']:.0f} bytes per frame on average, {stats['max_frame_bytes']} at most")
+    else:
+        create_video_from_frames(frame_deltas, shape, "ascii-art-matrix-effect.mp4", frame_count, workers)
 """
 Feature:
     Generate a MP4 video with matrix effect from ascii-art of an image file.
@@ -129,14 +130,18 @@ Feature:
 Args:
     image_file_path: str - Path to the image file.
     frame_count: int - Number of frames to generate (optional, default: 500).
+    workers: int - Threads drawing the frames (optional, default: number of CPUs, at most 4).
 
 Usage:
-    python3 ascii-art-matrix-effect.py <image_file_path> <frame_count>
+    python3 ascii-art-matrix-effect.py <image_file_path> <frame_count> <workers>
+    python3 ascii-art-matrix-effect.py <image_file_path> <frame_count> --terminal
 
 Example:
     python3 ascii-art-matrix-effect.py example/ztm-logo.png
     python3 ascii-art-matrix-effect.py example/ztm-logo.png 1000
+    python3 ascii-art-matrix-effect.py example/ztm-logo.png 1000 --terminal
 
 Output file:
-    ascii-art-matrix-effect.mp4
+    ascii-art-matrix-effect.mp4, or playback in the terminal with --terminal
+    (a status line below the art shows the bytes sent per frame while it plays, a summary follows at the end)
 """
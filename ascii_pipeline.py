@@ -0,0 +1,214 @@
+import random
+from typing import Iterator, Optional, Tuple
+
+import numpy as np
+from PIL import Image, ImageEnhance, ImageFilter, ImageOps
+
+from ascii_engine import draft_for_size, iter_ascii_html, iter_ascii_lines, iter_resized_strips, premultiply_alpha
+
+
+def ascii_size(image: Image.Image, new_width: int = 100) -> Tuple[int, int]:
+    """Grid size of the ASCII art of an image, rows squeezed for the tall aspect of terminal glyphs.
+
+    Args:
+        image (Image.Image): Source image.
+        new_width (int, optional): Characters per line. Defaults to 100.
+
+    Returns:
+        Tuple[int, int]: ``(width, height)`` in characters.
+    """
+    width, height = image.size
+    aspect_ratio = height / width
+    new_height = int(aspect_ratio * new_width * 0.55)
+    return new_width, new_height
+
+
+def enhance_contrast(image: Image.Image, contrast: float, mean: int) -> Image.Image:
+    """Same blend as ``ImageEnhance.Contrast``, but around a given mean instead of the image's own.
+
+    Args:
+        image (Image.Image): Image to adjust.
+        contrast (float): Contrast factor.
+        mean (int): Gray level to pivot on.
+
+    Returns:
+        Image.Image: The adjusted image.
+    """
+    degenerate = Image.new("L", image.size, mean)
+    if degenerate.mode != image.mode:
+        degenerate = degenerate.convert(image.mode)
+    if "A" in image.getbands():
+        degenerate.putalpha(image.getchannel("A"))
+    return Image.blend(degenerate, image, contrast)
+
+
+def apply_image_filters(image: Image.Image, brightness: float, contrast: float, blur: bool, sharpen: bool, contrast_mean: Optional[int] = None) -> Image.Image:
+    """Apply the brightness, contrast, blur and sharpen options of the ``generate`` command.
+
+    Args:
+        image (Image.Image): Image to filter.
+        brightness (float): Brightness factor, 1.0 leaves it unchanged.
+        contrast (float): Contrast factor, 1.0 leaves it unchanged.
+        blur (bool): Apply ``ImageFilter.BLUR``.
+        sharpen (bool): Apply ``ImageFilter.SHARPEN``.
+        contrast_mean (int, optional): Gray level contrast pivots on, None uses the image's own mean. Defaults to None.
+
+    Returns:
+        Image.Image: The filtered image.
+    """
+    if brightness != 1.0:
+        image = ImageEnhance.Brightness(image).enhance(brightness)
+    if contrast != 1.0:
+        if contrast_mean is None:
+            image = ImageEnhance.Contrast(image).enhance(contrast)
+        else:
+            image = enhance_contrast(image, contrast, contrast_mean)
+    if blur:
+        image = image.filter(ImageFilter.BLUR)
+    if sharpen:
+        image = image.filter(ImageFilter.SHARPEN)
+    return image
+
+
+def create_contours(image: Image.Image) -> Image.Image:
+    """Keep only the edges of an image.
+
+    Args:
+        image (Image.Image): Image to filter.
+
+    Returns:
+        Image.Image: The edges, from ``ImageFilter.FIND_EDGES``.
+    """
+    return image.filter(ImageFilter.FIND_EDGES)
+
+
+def iter_prepared_strips(
+    image: Image.Image,
+    width: int = 100,
+    brightness: float = 1.0,
+    contrast: float = 1.0,
+    blur: bool = False,
+    sharpen: bool = False,
+    contours: bool = False,
+    invert: bool = False,
+    strip_rows: int = 32,
+) -> Iterator[Image.Image]:
+    """Resize and filter an image for the ``generate`` pipeline one strip at a time.
+
+    Args:
+        image (Image.Image): Source image, ideally not loaded yet so JPEGs can be drafted.
+        width (int, optional): Characters per line. Defaults to 100.
+        brightness (float, optional): Brightness factor. Defaults to 1.0.
+        contrast (float, optional): Contrast factor. Defaults to 1.0.
+        blur (bool, optional): Apply a blur. Defaults to False.
+        sharpen (bool, optional): Sharpen. Defaults to False.
+        contours (bool, optional): Keep only the edges. Defaults to False.
+        invert (bool, optional): Invert the colors. Defaults to False.
+        strip_rows (int, optional): Output rows per strip. Defaults to 32.
+
+    Yields:
+        Image.Image: Consecutive strips of the resized, filtered image.
+    """
+    size = ascii_size(image, width)
+    box, reducing_gap = draft_for_size(image, size)
+    # both passes below resize out of the same premultiplied copy
+    mode = image.mode
+    image = premultiply_alpha(image)
+
+    contrast_mean = None
+    if contrast != 1.0:
+        # contrast pivots on the mean gray level of the whole resized image, so take it in a first pass
+        total = count = 0
+        for strip in iter_resized_strips(image, size, strip_rows, box=box, reducing_gap=reducing_gap, mode=mode):
+            gray = np.asarray(apply_image_filters(strip, brightness, 1.0, False, False).convert("L"))
+            total += int(gray.sum(dtype=np.int64))
+            count += gray.size
+        contrast_mean = int(total / max(count, 1) + 0.5)
+
+    def prepare(strip):
+        strip = apply_image_filters(strip, brightness, contrast, blur, sharpen, contrast_mean)
+        if contours:
+            strip = create_contours(strip)
+        if invert:
+            strip = ImageOps.invert(strip.convert("RGB"))
+        return strip
+
+    # BLUR reads 2 rows around a pixel, SHARPEN and FIND_EDGES 1 each
+    halo = 2 * blur + sharpen + contours
+    yield from iter_resized_strips(image, size, strip_rows, halo, prepare, box, reducing_gap, mode)
+
+
+def stream_ascii_art(
+    image: Image.Image,
+    width: int = 100,
+    pattern: str = "basic",
+    colorize: bool = False,
+    theme: str = "grayscale",
+    brightness: float = 1.0,
+    contrast: float = 1.0,
+    blur: bool = False,
+    sharpen: bool = False,
+    contours: bool = False,
+    invert: bool = False,
+    strip_rows: int = 32,
+    rng: Optional[random.Random] = None,
+) -> Iterator[str]:
+    """Yield the lines of the ``generate`` pipeline's ASCII art, resizing and filtering one strip at a time.
+
+    Args:
+        image (Image.Image): Source image.
+        width (int, optional): Characters per line. Defaults to 100.
+        pattern (str, optional): Key of ``ASCII_PATTERNS``. Defaults to "basic".
+        colorize (bool, optional): Wrap every glyph in a rich color tag. Defaults to False.
+        theme (str, optional): Key of ``COLOR_THEMES`` used when colorizing. Defaults to "grayscale".
+        brightness (float, optional): Brightness factor. Defaults to 1.0.
+        contrast (float, optional): Contrast factor. Defaults to 1.0.
+        blur (bool, optional): Apply a blur. Defaults to False.
+        sharpen (bool, optional): Sharpen. Defaults to False.
+        contours (bool, optional): Keep only the edges. Defaults to False.
+        invert (bool, optional): Invert the colors. Defaults to False.
+        strip_rows (int, optional): Output rows per strip. Defaults to 32.
+        rng (random.Random, optional): Generator of the theme colors, e.g. seeded per request for reproducible art; None uses the module-level one. Defaults to None.
+
+    Yields:
+        str: One line of ASCII art, without the trailing newline.
+    """
+    strips = iter_prepared_strips(image, width, brightness, contrast, blur, sharpen, contours, invert, strip_rows)
+    yield from iter_ascii_lines(strips, pattern, colorize, theme, rng)
+
+
+def stream_ascii_html(
+    image: Image.Image,
+    width: int = 100,
+    pattern: str = "basic",
+    theme: str = "grayscale",
+    brightness: float = 1.0,
+    contrast: float = 1.0,
+    blur: bool = False,
+    sharpen: bool = False,
+    contours: bool = False,
+    invert: bool = False,
+    strip_rows: int = 32,
+    rng: Optional[random.Random] = None,
+) -> Iterator[str]:
+    """Yield the ``generate`` pipeline's art as colorized HTML, one row at a time.
+
+    Args:
+        image (Image.Image): Source image.
+        width (int, optional): Characters per line. Defaults to 100.
+        pattern (str, optional): Key of ``ASCII_PATTERNS``. Defaults to "basic".
+        theme (str, optional): Key of ``COLOR_THEMES``. Defaults to "grayscale".
+        brightness (float, optional): Brightness factor. Defaults to 1.0.
+        contrast (float, optional): Contrast factor. Defaults to 1.0.
+        blur (bool, optional): Apply a blur. Defaults to False.
+        sharpen (bool, optional): Sharpen. Defaults to False.
+        contours (bool, optional): Keep only the edges. Defaults to False.
+        invert (bool, optional): Invert the colors. Defaults to False.
+        strip_rows (int, optional): Output rows per strip. Defaults to 32.
+        rng (random.Random, optional): Generator of the theme colors, e.g. seeded per request for reproducible art; None uses the module-level one. Defaults to None.
+
+    Yields:
+        str: The opening markup, one row at a time, then the closing tag; concatenated they form the document fragment.
+    """
+    strips = iter_prepared_strips(image, width, brightness, contrast, blur, sharpen, contours, invert, strip_rows)
+    yield from iter_ascii_html(strips, pattern, theme, rng=rng)
@@ -0,0 +1,81 @@
+import argparse
+import time
+from typing import Callable, Iterator, Tuple
+
+import numpy as np
+from PIL import Image
+
+from ascii_engine import REDUCING_GAP, iter_resized_strips
+
+
+def per_strip_resize(image: Image.Image, size: Tuple[int, int], strip_rows: int) -> Iterator[Image.Image]:
+    """Strips resized straight out of the source, as before alpha sources were premultiplied once.
+
+    For RGBA and LA sources every ``Image.resize`` call converts the whole source to premultiplied alpha.
+    """
+    width, height = size
+    scale_y = image.height / height
+    for top in range(0, height, strip_rows):
+        bottom = min(height, top + strip_rows)
+        yield image.resize((width, bottom - top), box=(0, top * scale_y, image.width, bottom * scale_y), reducing_gap=REDUCING_GAP)
+
+
+def best_seconds(func: Callable[[], object], repeat: int) -> float:
+    """Fastest of ``repeat`` runs, in seconds."""
+    timings = []
+    for _ in range(repeat):
+        started = time.perf_counter()
+        func()
+        timings.append(time.perf_counter() - started)
+    return min(timings)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Time strip-wise resizing of an RGBA source against one whole resize.")
+
+    parser.add_argument("--input", "-i", type=str, help="Image to resize, converted to RGBA. (default value: random 4000x4000 RGBA noise)", default=None)
+    parser.add_argument("--width", "-w", type=int, help="Output width in characters. (default value: 1000)", default=1000)
+    parser.add_argument("--strip_rows", "-s", type=int, help="Output rows per strip. (default value: 32)", default=32)
+    parser.add_argument("--repeat", "-r", type=int, help="Runs per measurement, the fastest counts. (default value: 3)", default=3)
+    parser.add_argument("--max_ratio", "-m", type=float, help="Fail when strips take longer than this many whole resizes. (default value: 2.0)", default=2.0)
+
+    args = parser.parse_args()
+
+    if args.input:
+        image = Image.open(args.input).convert("RGBA")
+    else:
+        image = Image.fromarray(np.random.default_rng(0).integers(0, 256, (4000, 4000, 4), dtype=np.uint8), "RGBA")
+    image.load()
+    size = (args.width, int(image.height / image.width * args.width * 0.55))
+
+    # the strips must stay exactly what resizing every band of the source gives
+    expected = [strip.tobytes() for strip in per_strip_resize(image, size, args.strip_rows)]
+    actual = [strip.tobytes() for strip in iter_resized_strips(image, size, args.strip_rows, reducing_gap=REDUCING_GAP)]
+    assert actual == expected, "iter_resized_strips changed the output"
+
+    whole = best_seconds(lambda: image.resize(size, reducing_gap=REDUCING_GAP), args.repeat)
+    before = best_seconds(lambda: list(per_strip_resize(image, size, args.strip_rows)), args.repeat)
+    after = best_seconds(lambda: list(iter_resized_strips(image, size, args.strip_rows, reducing_gap=REDUCING_GAP)), args.repeat)
+
+    strips = -(-size[1] // args.strip_rows)
+    print(f"{image.width}x{image.height} RGBA -> {size[0]}x{size[1]} in {strips} strips")
+    print(f"{'whole resize':>22} {whole * 1000:8.1f} ms")
+    print(f"{'per-strip resize':>22} {before * 1000:8.1f} ms")
+    print(f"{'iter_resized_strips':>22} {after * 1000:8.1f} ms")
+    if after > args.max_ratio * whole:
+        raise SystemExit(f"iter_resized_strips took {after / whole:.1f} whole resizes, more than {args.max_ratio}")
+
+"""
+Feature:
+    Regression timing of strip-wise resizing for images with alpha.
+    Image.resize converts a whole RGBA or LA source to premultiplied alpha on every call, so resizing strip by strip
+    used to convert the source once per strip. iter_resized_strips converts it once; this checks its strips are
+    unchanged and that it stays within --max_ratio of one whole resize.
+
+Usage:
+    python3 benchmark-ascii-strips.py [--input <image_file_path>] [--width <width>] [--strip_rows <rows>] [--max_ratio <ratio>]
+
+Example:
+    python3 benchmark-ascii-strips.py
+    python3 benchmark-ascii-strips.py --input example/ztm-logo.png --width 200
+"""
@@ -0,0 +1,100 @@
+import argparse
+import importlib.util
+import time
+
+import numpy as np
+
+from edge_sampling import sample_edge_pixels
+
+# geometric-art.py has a hyphen in its name, so it is loaded from its path
+spec = importlib.util.spec_from_file_location("geometric_art", "geometric-art.py")
+geometric_art = importlib.util.module_from_spec(spec)
+spec.loader.exec_module(geometric_art)
+
+
+def target_probabilities(edges, edge_bias=0.8):
+    """Probability of every pixel that sample_edge_pixels is meant to follow: edge strength mixed with a uniform share."""
+    weights = edges.ravel() / edges.sum() if edges.sum() > 0 else np.full(edges.size, 1 / edges.size)
+    return edge_bias * weights + (1 - edge_bias) / edges.size
+
+
+def check_distribution(edges, draws, seed):
+    """Pixel counts of many draws must stay within six standard deviations of the target probabilities."""
+    np.random.seed(seed)
+    counts = np.bincount(sample_edge_pixels(edges, draws), minlength=edges.size)
+    expected = target_probabilities(edges) * draws
+    deviation = np.abs(counts - expected) / np.sqrt(expected * (1 - expected / draws))
+    assert deviation.max() < 6, f"pixel {deviation.argmax()} drawn {counts[deviation.argmax()]} times, expected {expected[deviation.argmax()]:.1f}"
+
+
+def premultiplied(image):
+    rgb = image[..., :3].astype(np.float64)
+    return rgb * (image[..., 3:] / 255) if image.shape[2] == 4 else rgb
+
+
+def geometric_error(image, generate, num_points, seeds):
+    """Mean absolute RGB error (alpha weighted) of average-color geometric art against its source, over ``seeds`` seeds."""
+    errors = []
+    for seed in range(seeds):
+        np.random.seed(seed)
+        points = generate(image, num_points)
+        triangulation = geometric_art.create_delaunay_triangulation(points)
+        result = np.asarray(geometric_art.render_geometric_art(image, points, triangulation, "average"))
+        errors.append(np.abs(premultiplied(result) - premultiplied(image)).mean())
+    return np.mean(errors)
+
+
+def best_seconds(repeat, func, *args):
+    timings = []
+    for _ in range(repeat):
+        started = time.perf_counter()
+        func(*args)
+        timings.append(time.perf_counter() - started)
+    return min(timings)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Check the edge-weighted sampler, time it, and compare geometric art from edge-weighted and uniform points.")
+
+    parser.add_argument("--input", "-i", type=str, help="Image to sample. (default value: example/ztm-logo.png)", default="example/ztm-logo.png")
+    parser.add_argument("--num_points", "-n", type=int, nargs="+", help="Point counts of the quality comparison. (default value: 250 500 1000 2000)", default=[250, 500, 1000, 2000])
+    parser.add_argument("--seeds", "-s", type=int, help="Seeds averaged per point count. (default value: 3)", default=3)
+    parser.add_argument("--draws", "-d", type=int, help="Points drawn for the distribution check and the timing. (default value: 50000)", default=50000)
+
+    args = parser.parse_args()
+
+    # a small edge map with strong, weak and zero pixels, and one without any edge at all
+    edges = np.random.default_rng(0).random((12, 16)) ** 4
+    edges[3:5] = 0
+    check_distribution(edges, 100 * args.draws, 0)
+    check_distribution(np.zeros((12, 16)), 100 * args.draws, 1)
+    print(f"{100 * args.draws} draws follow the target probabilities, with and without edges")
+
+    image = geometric_art.load_image(args.input)
+    image_edges = geometric_art.detect_edges(image)
+    # both build their probabilities from the edge map inside the timed call
+    sampler = best_seconds(3, sample_edge_pixels, image_edges, args.draws)
+    choice = best_seconds(3, lambda: np.random.choice(image_edges.size, args.draws, p=target_probabilities(image_edges)))
+    print(f"{image.shape[1]}x{image.shape[0]}, {args.draws} points: sample_edge_pixels {sampler * 1000:.1f} ms, np.random.choice {choice * 1000:.1f} ms")
+
+    print(f"{'points':>8} {'uniform error':>14} {'edges error':>12}")
+    for num_points in args.num_points:
+        uniform = geometric_error(image, geometric_art.generate_points, num_points, args.seeds)
+        edge_weighted = geometric_error(image, geometric_art.generate_edge_weighted_points, num_points, args.seeds)
+        print(f"{num_points:>8} {uniform:>14.2f} {edge_weighted:>12.2f}")
+
+"""
+Feature:
+    Benchmark of sample_edge_pixels (edge_sampling.py), the edge-weighted sampler of geometric-art.py and pointillism-art.py.
+    Many draws on a small edge map, and on one without edges, must first follow the target probabilities within six
+    standard deviations per pixel. The sampler is then timed against np.random.choice with the same probabilities, and
+    geometric art (average colors) from uniform and from edge-weighted points is compared by its mean absolute RGB
+    error against the source, alpha weighted and averaged over --seeds seeds.
+
+Usage:
+    python3 benchmark-edge-sampling.py [--input <image_file_path>] [--num_points <counts>] [--seeds <count>] [--draws <count>]
+
+Example:
+    python3 benchmark-edge-sampling.py
+    python3 benchmark-edge-sampling.py --input texture-art-source/p1.jpg --num_points 1000 4000
+"""
@@ -0,0 +1,109 @@
+import argparse
+import importlib.util
+import io
+import os
+import tempfile
+import time
+
+import matplotlib
+import numpy as np
+from PIL import Image
+
+# geometric-art.py has a hyphen in its name, so it is loaded from its path
+spec = importlib.util.spec_from_file_location("geometric_art", "geometric-art.py")
+geometric_art = importlib.util.module_from_spec(spec)
+spec.loader.exec_module(geometric_art)
+
+
+def barycentric_inside(points, triangulation, height, width):
+    """Per pixel and triangle, whether the pixel center lies inside the triangle, from the vertices alone (no find_simplex)."""
+    y, x = np.mgrid[0:height, 0:width]
+    a, b, c = (points[triangulation.simplices][:, i].astype(np.float64) for i in range(3))
+    pixels = np.stack([x.ravel(), y.ravel()], axis=1)[:, None, :].astype(np.float64)
+    area = (b[:, 0] - a[:, 0]) * (c[:, 1] - a[:, 1]) - (c[:, 0] - a[:, 0]) * (b[:, 1] - a[:, 1])
+    u = ((b[:, 0] - pixels[..., 0]) * (c[:, 1] - pixels[..., 1]) - (c[:, 0] - pixels[..., 0]) * (b[:, 1] - pixels[..., 1])) / area
+    v = ((c[:, 0] - pixels[..., 0]) * (a[:, 1] - pixels[..., 1]) - (a[:, 0] - pixels[..., 0]) * (c[:, 1] - pixels[..., 1])) / area
+    return (u >= -1e-9) & (v >= -1e-9) & (1 - u - v >= -1e-9)
+
+
+def check_fill(image, num_points, seed):
+    """Every pixel must get a triangle containing it, whatever the chunking, and that triangle's center color like its old patch."""
+    image = np.asarray(Image.fromarray(image).convert("RGBA"))
+    height, width = image.shape[:2]
+    np.random.seed(seed)
+    points = geometric_art.generate_points(image, num_points)
+    triangulation = geometric_art.create_delaunay_triangulation(points)
+    labels = geometric_art.triangle_labels(triangulation, image.shape)
+    assert np.array_equal(geometric_art.triangle_labels(triangulation, image.shape, chunk_rows=7), labels), "labels depend on the row chunking"
+
+    inside = barycentric_inside(points, triangulation, height, width)
+    flat_labels = labels.ravel()
+    assert (flat_labels >= 0).all(), "the corner points leave pixels outside every triangle"
+    assert inside[np.arange(len(flat_labels)), flat_labels].all(), "a pixel was given a triangle that does not contain it"
+
+    # the color of each triangle, looked up one triangle at a time as draw_geometric_art does, over the image
+    layer = np.zeros((height, width, 4), dtype=np.uint8)
+    for index, triangle in enumerate(triangulation.simplices):
+        center = np.mean(points[triangle], axis=0).astype(int)
+        layer[labels == index] = image[center[1], center[0]]
+    expected = Image.alpha_composite(Image.fromarray(image, "RGBA"), Image.fromarray(layer, "RGBA"))
+    assert geometric_art.render_geometric_art(image, points, triangulation).tobytes() == expected.tobytes(), "a triangle was filled with another color"
+
+
+def render_png(image, points, triangulation):
+    geometric_art.render_geometric_art(image, points, triangulation).save(io.BytesIO(), "PNG")
+
+
+def seconds(func, *args):
+    started = time.perf_counter()
+    func(*args)
+    return time.perf_counter() - started
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Time the find_simplex raster fill of geometric-art.py against its matplotlib patch backend.")
+
+    parser.add_argument("--input", "-i", type=str, help="Image to turn into geometric art. (default value: example/ztm-logo.png)", default="example/ztm-logo.png")
+    parser.add_argument("--resize_factor", "-r", type=float, help="Scale of the input, as in geometric-art.py. (default value: 1)", default=1)
+    parser.add_argument("--num_points", "-n", type=int, nargs="+", help="Point counts to time. (default value: 500 5000)", default=[500, 5000])
+
+    args = parser.parse_args()
+    matplotlib.use("Agg")
+    import matplotlib.pyplot as plt
+
+    # the fill is checked against plain barycentric coordinates on a small copy of the input
+    small = geometric_art.load_image(args.input, 120 / Image.open(args.input).width)
+    for seed in range(3):
+        check_fill(small, 200, seed)
+    print(f"{small.shape[1]}x{small.shape[0]}: every pixel lies in its triangle and has its color on 3 seeds, with any row chunking")
+
+    image = geometric_art.load_image(args.input, args.resize_factor)
+    print(f"{image.shape[1]}x{image.shape[0]}")
+    print(f"{'points':>8} {'matplotlib s':>13} {'raster s':>9}")
+    with tempfile.TemporaryDirectory() as folder:
+        for num_points in args.num_points:
+            np.random.seed(0)
+            points = geometric_art.generate_points(image, num_points)
+            triangulation = geometric_art.create_delaunay_triangulation(points)
+
+            # both include writing the PNG
+            before = seconds(geometric_art.draw_geometric_art, image, points, triangulation, os.path.join(folder, "matplotlib.png"))
+            plt.close("all")
+            after = seconds(render_png, image, points, triangulation)
+            print(f"{num_points:>8} {before:>13.2f} {after:>9.3f}")
+
+"""
+Feature:
+    Benchmark of the raster backend of geometric-art.py, which labels every pixel with Delaunay.find_simplex and fills
+    all triangles with one gather, against the matplotlib backend that draws one Polygon patch per triangle.
+    On a small copy of the input, every pixel must first be labelled with a triangle that contains it according to
+    barycentric coordinates computed from the vertices, whatever the row chunking, and be filled with the center color
+    that triangle's patch had.
+
+Usage:
+    python3 benchmark-geometric-fill.py [--input <image_file_path>] [--resize_factor <factor>] [--num_points <counts>]
+
+Example:
+    python3 benchmark-geometric-fill.py
+    python3 benchmark-geometric-fill.py --resize_factor 4 --num_points 500 5000 50000
+"""
@@ -0,0 +1,96 @@
+import argparse
+import random
+import time
+from typing import Callable, Tuple
+
+import numpy as np
+from PIL import Image
+
+from ascii_engine import ASCII_PATTERNS, COLOR_THEMES, bucket_glyph_lut, join_glyph_rows, render_ascii
+
+
+def loop_create_ascii_art(image: Image.Image, pattern: str, colorize: bool = False, theme: str = "grayscale") -> str:
+    """create_ascii_art as it was before the lookup table: one np.mean and, colorized, one random.choice per pixel."""
+    ascii_chars = ASCII_PATTERNS[pattern]
+    ascii_art = []
+    pixels = np.array(image)
+    for y in range(image.height):
+        line = []
+        for x in range(image.width):
+            char = ascii_chars[int(np.mean(pixels[y, x]) / 255 * (len(ascii_chars) - 1))]
+            if colorize:
+                color = random.choice(COLOR_THEMES[theme])
+                line.append(f"[color rgb({color[0]},{color[1]},{color[2]})]" + char + "[/color]")
+            else:
+                line.append(char)
+        ascii_art.append("".join(line))
+    return "\n".join(ascii_art)
+
+
+def vectorize_map_pixels(image: Image.Image, pattern: list) -> str:
+    """map_pixels_to_ascii as it was before the lookup table: np.vectorize over a Python lambda."""
+    pixels = np.array(image.convert("L"))
+    ascii_chars = np.vectorize(lambda pixel: pattern[min(pixel // (256 // len(pattern)), len(pattern) - 1)])(pixels)
+    return "\n".join("".join(row) for row in ascii_chars)
+
+
+def lut_map_pixels(image: Image.Image, pattern: list) -> str:
+    """map_pixels_to_ascii as it is now: one fancy index into the bucket lookup table."""
+    return join_glyph_rows(bucket_glyph_lut(len(pattern))[np.array(image.convert("L"))], pattern)
+
+
+def seeded_run(func: Callable[..., str], *args) -> Tuple[str, float, float]:
+    """Output and seconds of ``func(*args)`` on a seeded ``random`` module, and the next random number, so the state after it is compared too."""
+    random.seed(42)
+    started = time.perf_counter()
+    output = func(*args)
+    seconds = time.perf_counter() - started
+    return output, seconds, random.random()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Time the lookup-table glyph mapping against the per-pixel loops it replaced.")
+
+    parser.add_argument("--input", "-i", type=str, help="Image to convert. (default value: example/ztm-logo.png)", default="example/ztm-logo.png")
+    parser.add_argument("--widths", "-w", type=int, nargs="+", help="Output widths in characters. (default value: 100 400)", default=[100, 400])
+    parser.add_argument("--pattern", "-p", type=str, choices=ASCII_PATTERNS.keys(), help="ASCII pattern. (default value: basic)", default="basic")
+    parser.add_argument("--theme", "-t", type=str, choices=COLOR_THEMES.keys(), help="Color theme of the colorized runs. (default value: neon)", default="neon")
+
+    args = parser.parse_args()
+
+    source = Image.open(args.input).convert("RGB")
+    cases = {
+        "create_ascii_art": (loop_create_ascii_art, render_ascii, (args.pattern,)),
+        "colorized": (loop_create_ascii_art, render_ascii, (args.pattern, True, args.theme)),
+        "map_pixels_to_ascii": (vectorize_map_pixels, lut_map_pixels, (ASCII_PATTERNS[args.pattern],)),
+    }
+    # one untimed call of every version first, so one-time setup is not counted
+    for before_func, after_func, extra_args in cases.values():
+        seeded_run(before_func, source.resize((8, 4)), *extra_args)
+        seeded_run(after_func, source.resize((8, 4)), *extra_args)
+
+    print(f"{'width':>6} " + " ".join(f"{name + ' ms':>24}" for name in cases))
+    for width in args.widths:
+        image = source.resize((width, int(width * source.height / source.width * 0.55)))
+        cells = []
+        for name, (before_func, after_func, extra_args) in cases.items():
+            # the new version must give the same text and leave the random module where the loop left it
+            expected, before, expected_state = seeded_run(before_func, image, *extra_args)
+            actual, after, actual_state = seeded_run(after_func, image, *extra_args)
+            assert actual == expected and actual_state == expected_state, f"width {width}, {name}: text or random state differs"
+            cells.append(f"{before * 1000:>11.1f} -> {after * 1000:>8.2f}")
+        print(f"{width:>6} " + " ".join(cells))
+
+"""
+Feature:
+    Benchmark of the lookup-table glyph mapping of ascii_engine against the per-pixel loops it replaced:
+    create_ascii_art (plain and colorized, one random.choice per pixel) and map_pixels_to_ascii (np.vectorize).
+    Every timed run is also compared: the text must be identical, and so must the random state it leaves behind.
+
+Usage:
+    python3 benchmark-glyph-mapping.py [--input <image_file_path>] [--widths <widths>] [--pattern <pattern>] [--theme <theme>]
+
+Example:
+    python3 benchmark-glyph-mapping.py
+    python3 benchmark-glyph-mapping.py --widths 100 400 1000 --pattern complex --theme pastel
+"""
@@ -0,0 +1,77 @@
+import argparse
+import time
+
+import numpy as np
+from PIL import Image, ImageDraw
+
+from fastapi_source.application.ascii.ascii_service import mosaic_image
+
+
+def loop_mosaic_image(input_image: Image.Image, block_size: int) -> Image.Image:
+    """mosaic_image as it was before vectorizing: one np.mean and one ImageDraw.rectangle per block."""
+    img = np.array(input_image)
+    height, width, _ = img.shape
+    result_img = Image.new("RGBA", (width, height), (0, 0, 0, 0))
+    draw = ImageDraw.Draw(result_img)
+    for y in range(0, height, block_size):
+        for x in range(0, width, block_size):
+            block = img[y : y + block_size, x : x + block_size]
+            if np.mean(block[:, :, 3]) < 50:
+                continue
+            avg_color = np.mean(block[:, :, :3], axis=(0, 1)).astype(int)
+            draw.rectangle([x, y, x + block_size, y + block_size], fill=tuple(avg_color) + (255,))
+    return result_img
+
+
+def random_rgba(rng: np.random.Generator) -> Image.Image:
+    """Small RGBA image of random size, half of it with random alpha and half fully transparent or opaque."""
+    height, width = rng.integers(1, 90, 2)
+    pixels = rng.integers(0, 256, (height, width, 4), dtype=np.uint8)
+    pixels[..., 3] = np.where(rng.random((height, width)) < 0.5, rng.integers(0, 256, (height, width)), rng.integers(0, 2, (height, width)) * 255)
+    return Image.fromarray(pixels, "RGBA")
+
+
+def seconds(func, *args) -> float:
+    started = time.perf_counter()
+    func(*args)
+    return time.perf_counter() - started
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Time the vectorized mosaic_image against the per-block drawing loop it replaced.")
+
+    parser.add_argument("--input", "-i", type=str, help="Image to make mosaic. (default value: example/ztm-logo.png)", default="example/ztm-logo.png")
+    parser.add_argument("--size", "-s", type=int, nargs=2, help="Width and height the input is resized to. (default value: 1920 1940)", default=[1920, 1940])
+    parser.add_argument("--block_sizes", "-b", type=int, nargs="+", help="Block sizes to time. (default value: 5 10 20 50)", default=[5, 10, 20, 50])
+
+    args = parser.parse_args()
+
+    # random images catch edge blocks, partial alpha and block sizes past the image border
+    rng = np.random.default_rng(0)
+    for _ in range(30):
+        image = random_rgba(rng)
+        for block_size in (1, 2, 3, 7, 10, 89, 100):
+            assert mosaic_image(image, block_size).tobytes() == loop_mosaic_image(image, block_size).tobytes(), f"{image.size}, block_size {block_size}: output differs"
+    print("30 random images x 7 block sizes identical")
+
+    image = Image.open(args.input).convert("RGBA").resize(tuple(args.size))
+    print(f"{'block_size':>10} {'loop ms':>10} {'mosaic_image ms':>16}")
+    for block_size in args.block_sizes:
+        assert mosaic_image(image, block_size).tobytes() == loop_mosaic_image(image, block_size).tobytes(), f"block_size {block_size}: output differs"
+        before = seconds(loop_mosaic_image, image, block_size)
+        after = min(seconds(mosaic_image, image, block_size) for _ in range(3))
+        print(f"{block_size:>10} {before * 1000:>10.1f} {after * 1000:>16.1f}")
+
+"""
+Feature:
+    Benchmark of the vectorized mosaic_image (mosaic-art.py and the /Mosaic routes) against the per-block drawing loop it replaced.
+    Random small RGBA images and the resized input are first checked to give byte-identical output, then the loop and
+    mosaic_image (fastest of three runs) are timed for every --block_sizes value.
+
+Usage:
+    python3 benchmark-mosaic.py [--input <image_file_path>] [--size <width> <height>] [--block_sizes <sizes>]
+
+Example:
+    python3 benchmark-mosaic.py
+    python3 benchmark-mosaic.py --size 4000 3000 --block_sizes 2 10 100
+"""
@@ -0,0 +1,102 @@
+import argparse
+import io
+import time
+from typing import Tuple
+
+import numpy as np
+from PIL import Image
+
+from ascii_engine import draft_for_size, glyph_indices
+from ascii_pipeline import ascii_size
+
+
+def detailed_image(width: int = 3200, height: int = 2400) -> Image.Image:
+    """Deterministic test photo: gradients, a fine interference pattern, noise and the ZTM logo."""
+    rng = np.random.default_rng(0)
+    y, x = np.mgrid[0:height, 0:width]
+    pixels = np.stack([x / width * 255, y / height * 255, 127 + 127 * np.sin(x / 37.0) * np.cos(y / 23.0)], axis=-1)
+    pixels += rng.normal(0, 25, pixels.shape)
+    image = Image.fromarray(np.clip(pixels, 0, 255).astype(np.uint8), "RGB")
+    logo = Image.open("example/ztm-logo.png").convert("RGBA").resize((height // 2, height // 2))
+    image.paste(logo, (width // 3, height // 4), logo)
+    return image
+
+
+def encoded(image: Image.Image, format: str) -> bytes:
+    buffer = io.BytesIO()
+    image.save(buffer, format=format, quality=90)
+    return buffer.getvalue()
+
+
+def full_and_drafted(data: bytes, width: int) -> Tuple[Image.Image, Image.Image, float, float]:
+    """Resize an encoded image to ``width`` characters as before drafting, and through ``draft_for_size``, timing both."""
+    started = time.perf_counter()
+    full = Image.open(io.BytesIO(data))
+    size = ascii_size(full, width)
+    expected = full.resize(size)
+    full_seconds = time.perf_counter() - started
+
+    started = time.perf_counter()
+    drafted = Image.open(io.BytesIO(data))
+    box, reducing_gap = draft_for_size(drafted, size)
+    actual = drafted.resize(size, box=box, reducing_gap=reducing_gap)
+    drafted_seconds = time.perf_counter() - started
+    return expected, actual, full_seconds, drafted_seconds
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Check that drafted JPEG decoding stays within tolerance and leaves other formats unchanged.")
+
+    parser.add_argument("--input", "-i", type=str, help="JPEG to check. (default value: a generated 3200x2400 photo)", default=None)
+    parser.add_argument("--widths", "-w", type=int, nargs="+", help="Output widths in characters. (default value: 100 200 400)", default=[100, 200, 400])
+    parser.add_argument("--max_level", type=int, help="Largest accepted difference of one resized channel. (default value: 6)", default=6)
+    parser.add_argument("--max_mean_level", type=float, help="Largest accepted mean channel difference. (default value: 1.0)", default=1.0)
+    parser.add_argument("--max_glyph_share", type=float, help="Largest accepted share of changed glyphs. (default value: 0.02)", default=0.02)
+
+    args = parser.parse_args()
+
+    image = detailed_image()
+    if args.input:
+        with open(args.input, "rb") as f:
+            jpeg = f.read()
+    else:
+        jpeg = encoded(image, "JPEG")
+
+    failures = []
+    print(f"{'format':>6} {'width':>5} {'decoded':>11} {'max':>4} {'mean':>6} {'glyphs':>7} {'full ms':>8} {'drafted ms':>10}")
+    for width in args.widths:
+        expected, actual, full_seconds, drafted_seconds = full_and_drafted(jpeg, width)
+        difference = np.abs(np.asarray(actual, dtype=np.int16) - np.asarray(expected, dtype=np.int16))
+        changed = np.mean(glyph_indices(actual.convert("L"), 11) != glyph_indices(expected.convert("L"), 11))
+        decoded = Image.open(io.BytesIO(jpeg))
+        draft_for_size(decoded, expected.size)
+        print(f"{'JPEG':>6} {width:>5} {decoded.width:>5}x{decoded.height:<5} {difference.max():>4} {difference.mean():6.3f} {changed:7.2%} {full_seconds * 1000:8.1f} {drafted_seconds * 1000:10.1f}")
+        if difference.max() > args.max_level or difference.mean() > args.max_mean_level or changed > args.max_glyph_share:
+            failures.append(f"JPEG at width {width} is out of tolerance")
+
+    # formats without DCT scaling must resize exactly as before
+    for format in ("PNG", "GIF"):
+        for width in args.widths:
+            expected, actual, _, _ = full_and_drafted(encoded(image, format), width)
+            identical = expected.tobytes() == actual.tobytes()
+            print(f"{format:>6} {width:>5} {'full':>11} {'identical' if identical else 'CHANGED'}")
+            if not identical:
+                failures.append(f"{format} at width {width} changed")
+
+    if failures:
+        raise SystemExit("\n".join(failures))
+
+"""
+Feature:
+    Tolerance check of draft_for_size, the reduced-scale JPEG decode of the ASCII pipeline.
+    A drafted JPEG must stay within --max_level / --max_mean_level of the full decode per resized channel and change
+    at most --max_glyph_share of the glyphs; PNG and GIF sources must resize byte for byte as without drafting.
+    The full and drafted decode + resize times are measured, not estimated.
+
+Usage:
+    python3 check-jpeg-draft-tolerance.py [--input <jpeg_file_path>] [--widths <widths>]
+
+Example:
+    python3 check-jpeg-draft-tolerance.py
+    python3 check-jpeg-draft-tolerance.py --input photo.jpg --widths 80 100 120
+"""
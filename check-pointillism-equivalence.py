@@ -0,0 +1,121 @@
+import argparse
+import importlib.util
+import time
+
+import numpy as np
+
+# pointillism-art.py has a hyphen in its name, so it is loaded from its path
+spec = importlib.util.spec_from_file_location("pointillism_art", "pointillism-art.py")
+pointillism = importlib.util.module_from_spec(spec)
+spec.loader.exec_module(pointillism)
+
+
+def loop_sample_colors(image, points):
+    """sample_colors as it was before vectorizing: one random draw and one sepia blend per point."""
+    height, width, _ = image.shape
+    colors = []
+    for point in points:
+        x, y = int(point[0]), int(point[1])
+        x = min(x, width - 1)
+        y = min(y, height - 1)
+        color = image[y, x]
+
+        perturbation = np.random.randint(-20, 21, size=3)
+        perturbed_color = np.clip(color + perturbation, 0, 255)
+
+        tr = int(0.393 * perturbed_color[0] + 0.769 * perturbed_color[1] + 0.189 * perturbed_color[2])
+        tg = int(0.349 * perturbed_color[0] + 0.686 * perturbed_color[1] + 0.168 * perturbed_color[2])
+        tb = int(0.272 * perturbed_color[0] + 0.534 * perturbed_color[1] + 0.131 * perturbed_color[2])
+        sepia_color = np.clip([tr, tg, tb], 0, 255)
+
+        blend_ratio = 0.5
+        colors.append(np.clip((1 - blend_ratio) * perturbed_color + blend_ratio * sepia_color, 0, 255))
+    return np.array(colors)
+
+
+def loop_compute_point_sizes(points, edges, min_size=1, max_size=50):
+    """compute_point_sizes as it was before vectorizing: edge values gathered and normalized point by point."""
+    height, width = edges.shape
+    edge_values = []
+    for point in points:
+        x, y = int(point[0]), int(point[1])
+        edge_values.append(edges[min(y, height - 1), min(x, width - 1)])
+
+    min_edge_value = min(edge_values)
+    max_edge_value = max(edge_values)
+    if max_edge_value != min_edge_value:
+        normalized_edge_values = [(ev - min_edge_value) / (max_edge_value - min_edge_value) for ev in edge_values]
+    else:
+        normalized_edge_values = [0 for _ in edge_values]
+    return np.array([min_size + (1 - value) * (max_size - min_size) for value in normalized_edge_values])
+
+
+def seeded_run(sample_colors, compute_point_sizes, image, edges, num_points, seed):
+    """Colors, sizes and the next random number of one seeded run, so the RNG state after it is compared too."""
+    np.random.seed(seed)
+    points = pointillism.generate_random_points(image, num_points)
+    colors = sample_colors(image, points)
+    sizes = compute_point_sizes(points, edges)
+    return colors, sizes, np.random.rand()
+
+
+def best_seconds(repeat, func, *args):
+    """Fastest of ``repeat`` calls of ``func(*args)``, in seconds."""
+    timings = []
+    for _ in range(repeat):
+        started = time.perf_counter()
+        func(*args)
+        timings.append(time.perf_counter() - started)
+    return min(timings)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Check that the vectorized pointillism sampling matches the per-point loops bit for bit, and time both.")
+
+    parser.add_argument("--input", "-i", type=str, help="Image to sample. (default value: example/ztm-logo.png)", default="example/ztm-logo.png")
+    parser.add_argument("--seeds", "-s", type=int, help="Number of seeds to compare. (default value: 5)", default=5)
+    parser.add_argument("--num_points", "-n", type=int, help="Points per seeded run. (default value: 20000)", default=20000)
+    parser.add_argument("--benchmark_points", "-b", type=int, nargs="+", help="Point counts to time. (default value: 10000 50000)", default=[10000, 50000])
+
+    args = parser.parse_args()
+
+    # the logo has few colors, random noise reaches every channel value and the clipping at both ends
+    images = {args.input: pointillism.load_image(args.input), "noise": np.random.default_rng(0).integers(0, 256, (400, 400, 3), dtype=np.uint8)}
+    for name, image in images.items():
+        edges = pointillism.detect_edges(image)
+        for seed in range(args.seeds):
+            expected = seeded_run(loop_sample_colors, loop_compute_point_sizes, image, edges, args.num_points, seed)
+            actual = seeded_run(pointillism.sample_colors, pointillism.compute_point_sizes, image, edges, args.num_points, seed)
+            assert actual[0].dtype == expected[0].dtype and np.array_equal(actual[0], expected[0]), f"{name}, seed {seed}: colors differ"
+            assert np.array_equal(actual[1], expected[1]), f"{name}, seed {seed}: point sizes differ"
+            assert actual[2] == expected[2], f"{name}, seed {seed}: random state differs afterwards"
+
+        # all points on one pixel take the branch without a range to normalize
+        points = np.full((4, 2), 5.0)
+        assert np.array_equal(pointillism.compute_point_sizes(points, edges), loop_compute_point_sizes(points, edges)), f"{name}: flat edge values differ"
+        print(f"{name}: {args.seeds} seeds x {args.num_points} points identical, random state included")
+
+    image = images[args.input]
+    edges = pointillism.detect_edges(image)
+    print(f"{'points':>8} {'sample_colors ms':>24} {'compute_point_sizes ms':>24}")
+    for num_points in args.benchmark_points:
+        points = pointillism.generate_random_points(image, num_points)
+        colors_before = best_seconds(1, loop_sample_colors, image, points)
+        colors_after = best_seconds(3, pointillism.sample_colors, image, points)
+        sizes_before = best_seconds(1, loop_compute_point_sizes, points, edges)
+        sizes_after = best_seconds(3, pointillism.compute_point_sizes, points, edges)
+        print(f"{num_points:>8} {colors_before * 1000:>11.1f} -> {colors_after * 1000:>9.1f} {sizes_before * 1000:>11.1f} -> {sizes_after * 1000:>9.1f}")
+
+"""
+Feature:
+    Equivalence check and benchmark of the vectorized sample_colors and compute_point_sizes of pointillism-art.py.
+    Seeded runs must give bit-identical colors and point sizes to the per-point loops they replaced and leave the global
+    random state where the loops left it, so a seed keeps producing the same art. Both versions are then timed.
+
+Usage:
+    python3 check-pointillism-equivalence.py [--input <image_file_path>] [--seeds <count>] [--num_points <count>] [--benchmark_points <counts>]
+
+Example:
+    python3 check-pointillism-equivalence.py
+    python3 check-pointillism-equivalence.py --input photo.jpg --seeds 10 --benchmark_points 10000 50000 500000
+"""
@@ -0,0 +1,63 @@
+import argparse
+import io
+import tracemalloc
+
+from render_cache import RenderCache, canonical_params
+
+
+def check_keys() -> None:
+    """Equal settings must give one key, whichever way a number is spelled; different settings must not."""
+    image = io.BytesIO(b"same image bytes")
+    params = {"width": 100, "brightness": 1, "contrast": 1.5, "blur": False, "pattern": "basic"}
+    spelled_as_floats = {"width": 100.0, "brightness": 1.0, "contrast": 1.5, "blur": False, "pattern": "basic"}
+    assert canonical_params(params) == canonical_params(spelled_as_floats), "1 and 1.0 serialize differently"
+    assert RenderCache.key("text", image, params) == RenderCache.key("text", image, spelled_as_floats), "1 and 1.0 give different keys"
+
+    # True == 1 in Python, but a flag and a number are different settings
+    assert canonical_params({"blur": True}) != canonical_params({"blur": 1}), "True and 1 serialize alike"
+    assert RenderCache.key("text", image, params) != RenderCache.key("text", image, {**params, "brightness": 1.1}), "different settings share a key"
+    assert RenderCache.key("text", image, params) != RenderCache.key("html", image, params), "text and html share a key"
+    print("keys: 1 and 1.0 agree, True and 1 and different settings do not")
+
+
+def check_entry_limit() -> None:
+    """Streamed renders are cached only while their UTF-8 encoding fits max_entry_bytes, and collecting them stays within it."""
+    cache = RenderCache(max_memory_bytes=2**24, max_entry_bytes=2**20)
+
+    # emoji are 4 bytes in UTF-8: 200k of them fit the limit as characters, but are 800 KB; 400k are 1.6 MB
+    for emoji, cached in ((200_000, True), (400_000, False)):
+        key = f"text-{emoji}-options"
+        lines = ("😁" * 1000 for _ in range(emoji // 1000))
+        tracemalloc.start()
+        streamed = sum(len(line) for line in cache.collect_lines(key, lines))
+        peak = tracemalloc.get_traced_memory()[1]
+        tracemalloc.stop()
+        value = cache.get(key)
+        assert streamed == emoji, "lines were lost while passing through"
+        assert (value is not None) == cached, f"{emoji} emoji, {4 * emoji} bytes: cached {value is not None}"
+        assert value is None or len(value) <= cache.max_entry_bytes, "cached entry is over the limit"
+        # collecting may hold about one entry of bytes plus a copy while joining, never the whole stream
+        assert peak < 2.5 * cache.max_entry_bytes, f"collecting {4 * emoji} bytes peaked at {peak} bytes"
+    print("entries: the size limit counts UTF-8 bytes, not characters, also while collecting")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Check the cache keys and the entry size limit of the render cache.")
+    parser.parse_args()
+
+    check_keys()
+    check_entry_limit()
+
+"""
+Feature:
+    Checks of the render cache behind the /Text, /Html and /Mosaic routes:
+    equal render settings give one cache key (``1`` and ``1.0`` agree), while a flag and a number, or different
+    settings, never share one. A streamed render is cached only while its UTF-8 encoding fits max_entry_bytes, so
+    multi-byte glyphs and HTML count at their real size.
+
+Usage:
+    python3 check-render-cache.py
+
+Example:
+    python3 check-render-cache.py
+"""
@@ -0,0 +1,131 @@
+import argparse
+import importlib.util
+import os
+import subprocess
+import sys
+import tempfile
+import time
+
+import numpy as np
+from PIL import Image
+
+# texture-art.py has a hyphen in its name, so it is loaded from its path
+spec = importlib.util.spec_from_file_location("texture_art", "texture-art.py")
+texture_art = importlib.util.module_from_spec(spec)
+spec.loader.exec_module(texture_art)
+
+
+def loop_apply_texture(input_image, texture_image, alpha_threshold=128):
+    """apply_texture_with_fit_cover as it was before the alpha mask: the texture copied pixel by pixel."""
+    input_width, input_height = input_image.size
+    texture_width, texture_height = texture_image.size
+
+    scale = max(input_width / texture_width, input_height / texture_height)
+    new_texture_size = (int(texture_width * scale), int(texture_height * scale))
+    texture_img_resized = texture_image.resize(new_texture_size, Image.Resampling.LANCZOS)
+
+    crop_x = (new_texture_size[0] - input_width) // 2
+    crop_y = (new_texture_size[1] - input_height) // 2
+    texture_img_cropped = texture_img_resized.crop((crop_x, crop_y, crop_x + input_width, crop_y + input_height))
+
+    input_alpha = input_image.split()[3]
+    result_img = Image.new("RGBA", (input_width, input_height), (0, 0, 0, 0))
+    for y in range(input_height):
+        for x in range(input_width):
+            if input_alpha.getpixel((x, y)) > alpha_threshold:
+                result_img.putpixel((x, y), texture_img_cropped.getpixel((x, y)))
+            else:
+                result_img.putpixel((x, y), (0, 0, 0, 0))
+    return result_img
+
+
+def synthetic_input(width, height):
+    """RGBA input whose alpha runs through every value from 0 to 255, with a fully transparent and an opaque band."""
+    y, x = np.mgrid[0:height, 0:width]
+    pixels = np.zeros((height, width, 4), dtype=np.uint8)
+    pixels[..., 0] = x * 255 // max(width - 1, 1)
+    pixels[..., 1] = y * 255 // max(height - 1, 1)
+    pixels[..., 2] = 90
+    pixels[..., 3] = (x * 256 // width).astype(np.uint8)
+    pixels[: height // 8, :, 3] = 0
+    pixels[-height // 8 :, :, 3] = 255
+    return Image.fromarray(pixels, "RGBA")
+
+
+def synthetic_texture(width, height):
+    """Deterministic RGB texture with an aspect ratio unlike the input, so fit-cover both scales and crops."""
+    y, x = np.mgrid[0:height, 0:width]
+    pixels = np.stack([127 + 127 * np.sin(x / 7.0), 127 + 127 * np.cos(y / 11.0), (x ^ y) & 255], axis=-1)
+    pixels += np.random.default_rng(0).normal(0, 20, pixels.shape)
+    return Image.fromarray(np.clip(pixels, 0, 255).astype(np.uint8), "RGB")
+
+
+def assert_same(actual, expected, label):
+    assert actual.mode == expected.mode and actual.size == expected.size, f"{label}: got {actual.mode} {actual.size}, expected {expected.mode} {expected.size}"
+    difference = np.argwhere(np.asarray(actual) != np.asarray(expected))
+    assert not len(difference), f"{label}: {len(difference)} channel values differ, first at (y, x, channel) {tuple(difference[0].tolist())}"
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Check that the mask compositing of texture-art.py matches the per-pixel copy it replaced, and time both.")
+
+    parser.add_argument("--width", "-W", type=int, help="Width of the synthetic input. (default value: 320)", default=320)
+    parser.add_argument("--height", "-H", type=int, help="Height of the synthetic input. (default value: 240)", default=240)
+    parser.add_argument("--thresholds", "-a", type=int, nargs="+", help="Alpha thresholds to compare. (default value: 0 1 128 200 254 255)", default=[0, 1, 128, 200, 254, 255])
+
+    args = parser.parse_args()
+
+    input_image = synthetic_input(args.width, args.height)
+    texture = synthetic_texture(args.width // 2 + 37, args.height * 2 + 11)
+
+    with tempfile.TemporaryDirectory() as folder:
+        input_path = os.path.join(folder, "input.png")
+        texture_path = os.path.join(folder, "texture.jpg")
+        input_image.save(input_path)
+        texture.save(texture_path, quality=90)
+        # the pre-change CLI always loaded both images through get_image_from_path, so in RGBA
+        loaded_input = texture_art.get_image_from_path(input_path)
+        loaded_texture = texture_art.get_image_from_path(texture_path)
+
+        for threshold in args.thresholds:
+            expected = loop_apply_texture(loaded_input, loaded_texture, threshold)
+
+            # an Image given directly, RGBA as the CLI loads it and RGB straight from the caller
+            assert_same(texture_art.apply_texture_with_fit_cover(loaded_input, loaded_texture, threshold), expected, f"RGBA texture, -a {threshold}")
+            assert_same(texture_art.apply_texture_with_fit_cover(loaded_input, texture, threshold), loop_apply_texture(loaded_input, texture, threshold), f"RGB texture, -a {threshold}")
+
+            # a path goes through TextureLibrary: a fresh resize, the in-memory copy, then the memory-mapped .npy copy
+            library = texture_art.TextureLibrary(folder, cache_dir=os.path.join(folder, f"npy-{threshold}"))
+            for source in ("resized", "memory"):
+                assert_same(texture_art.apply_texture_with_fit_cover(loaded_input, texture_path, threshold, library), expected, f"library ({source}), -a {threshold}")
+            library = texture_art.TextureLibrary(folder, cache_dir=library.cache_dir)
+            assert_same(texture_art.apply_texture_with_fit_cover(loaded_input, texture_path, threshold, library), expected, f"library (.npy), -a {threshold}")
+
+            # the command line, with -a passed through
+            output_path = os.path.join(folder, f"output-{threshold}.png")
+            subprocess.run([sys.executable, "texture-art.py", "-i", input_path, "-t", texture_path, "-o", output_path, "-a", str(threshold)], check=True)
+            assert_same(Image.open(output_path), expected, f"texture-art.py -a {threshold}")
+            print(f"-a {threshold:>3}: identical, {np.count_nonzero(np.asarray(expected)[..., 3])} of {args.width * args.height} pixels textured")
+
+        started = time.perf_counter()
+        loop_apply_texture(loaded_input, loaded_texture)
+        before = time.perf_counter() - started
+        started = time.perf_counter()
+        texture_art.apply_texture_with_fit_cover(loaded_input, loaded_texture)
+        after = time.perf_counter() - started
+        print(f"{args.width}x{args.height}: per-pixel copy {before * 1000:.1f} ms, mask composite {after * 1000:.1f} ms")
+
+"""
+Feature:
+    Equivalence check and benchmark of the texture compositing of texture-art.py.
+    A synthetic RGBA input, whose alpha covers every value, is textured with a synthetic texture of another aspect ratio.
+    For every --thresholds value (the -a option) the result must equal the per-pixel copy it replaced, for a texture
+    given as an RGBA or RGB image, through TextureLibrary (fresh, in memory and from the .npy cache) and from the CLI.
+
+Usage:
+    python3 check-texture-compositing.py [--width <width>] [--height <height>] [--thresholds <thresholds>]
+
+Example:
+    python3 check-texture-compositing.py
+    python3 check-texture-compositing.py --width 1024 --height 768 --thresholds 128
+"""
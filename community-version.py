@@ -1,5 +1,5 @@
 import typer
-from PIL import Image, ImageEnhance, ImageFilter, ImageOps, ImageDraw, ImageFont
+from PIL import Image, ImageOps, ImageDraw, ImageFont
 import streamlit as st
 from streamlit_webrtc import webrtc_streamer, WebRtcMode
 import numpy as np
@@ -7,42 +7,38 @@ from rich.console import Console
 from rich.panel import Panel
 from rich.progress import Progress
 import sys
+import io
+import os
+import glob
+import time
 import random
+from concurrent.futures import FIRST_COMPLETED, ProcessPoolExecutor, wait
+from concurrent.futures.process import BrokenProcessPool
+from render_cache import RenderCache, render_cache
+from ascii_pipeline import apply_image_filters, ascii_size, create_contours, stream_ascii_art
+from ascii_engine import (
+    ASCII_PATTERNS,
+    COLOR_THEMES,
+    choice_indices,
+    draft_for_size,
+    glyph_indices,
+    map_gray_to_text,
+    render_ascii,
+    render_ascii_html,
+)
 
 app = typer.Typer()
 console = Console()
 
-ASCII_PATTERNS = {
-    'basic': ['@', '#', 'S', '%', '?', '*', '+', ';', ':', ',', '.'],
-    'complex': ['▓', '▒', '░', '█', '▄', '▀', '▌', '▐', '▆', '▇', '▅', '▃', '▂'],
-    'emoji': ['😁', '😎', '🤔', '😱', '🤩', '😏', '😴', '😬', '😵', '😃'],
-    'numeric': ['1', '2', '3', '4', '5', '6', '7', '8', '9', '0'],
-}
-
-COLOR_THEMES = {
-    'neon': [(57, 255, 20), (255, 20, 147), (0, 255, 255)],
-    'pastel': [(255, 179, 186), (255, 223, 186), (186, 255, 201), (186, 225, 255)],
-    'grayscale': [(i, i, i) for i in range(0, 255, 25)],
-}
+IMAGE_EXTENSIONS = ('.jpg', '.jpeg', '.png', '.bmp', '.gif', '.webp', '.tif', '.tiff')
 
 
 def resize_image(image, new_width=100):
-    width, height = image.size
-    aspect_ratio = height / width
-    new_height = int(aspect_ratio * new_width * 0.55)
-    return image.resize((new_width, new_height))
-
-
-def apply_image_filters(image, brightness, contrast, blur, sharpen):
-    if brightness != 1.0:
-        image = ImageEnhance.Brightness(image).enhance(brightness)
-    if contrast != 1.0:
-        image = ImageEnhance.Contrast(image).enhance(contrast)
-    if blur:
-        image = image.filter(ImageFilter.BLUR)
-    if sharpen:
-        image = image.filter(ImageFilter.SHARPEN)
-    return image
+    size = ascii_size(image, new_width)
+    # a freshly opened JPEG is decoded at a reduced scale when the target is much smaller
+    box, reducing_gap = draft_for_size(image, size)
+    return image.resize(size, box=box, reducing_gap=reducing_gap)
+
 
 def text_to_image(text, canvas_width, canvas_height):
     image = Image.new('RGB', (canvas_width, canvas_height), color='white')
@@ -63,55 +59,70 @@ def flip_image(image: Image.Image, flip_horizontal: bool, flip_vertical: bool) -
     return image
 
 def create_ascii_art(image, pattern, colorize=False, theme='grayscale'):
-    ascii_chars = ASCII_PATTERNS[pattern]
-    ascii_art = []
-    pixels = np.array(image)
-
-    for y in range(image.height):
-        line = []
-        for x in range(image.width):
-            pixel = pixels[y, x]
-            char_index = int(np.mean(pixel) / 255 * (len(ascii_chars) - 1))
-            char = ascii_chars[char_index]
-            if colorize:
-                color = random.choice(COLOR_THEMES[theme])
-                line.append(f"[color rgb({color[0]},{color[1]},{color[2]})]" + char + "[/color]")
-            else:
-                line.append(char)
-        ascii_art.append("".join(line))
+    return render_ascii(image, pattern, colorize, theme)
 
-    return "\n".join(ascii_art)
+def write_ascii_lines(file, lines):
+    for index, line in enumerate(lines):
+        if index:
+            file.write("\n")
+        file.write(line)
 
 def map_pixels_to_ascii(image: Image.Image, pattern: list) -> str:
     grayscale_image = image.convert('L')
-    pixels = np.array(grayscale_image)
-    ascii_chars = np.vectorize(lambda pixel: pattern[min(pixel // (256 // len(pattern)), len(pattern) - 1)])(pixels)
-    ascii_image = "\n".join(["".join(row) for row in ascii_chars])
-    return ascii_image
+    pixels = np.asarray(grayscale_image)
+    return map_gray_to_text(pixels, pattern)
 
-# Function to create colorized ASCII art in HTML format
-def create_colorized_ascii_html(image: Image.Image, pattern: list, theme: str) -> str:
-    image = resize_image(image, 80, 'basic')
-    pixels = np.array(image)
+def decode_seconds(image_bytes, width=None, repeat=3):
+    """Best of ``repeat`` decodes of an encoded image, reduced for ASCII art ``width`` wide as generate does, or at full resolution."""
+    timings = []
+    for _ in range(repeat):
+        started = time.perf_counter()
+        image = Image.open(io.BytesIO(image_bytes))
+        if width:
+            draft_for_size(image, ascii_size(image, width))
+        image.load()
+        timings.append(time.perf_counter() - started)
+    return min(timings)
 
-    ascii_image_html = """
-    <div style='font-family: monospace; white-space: pre;'>
-    """
+# Function to create colorized ASCII art in HTML format
+def create_colorized_ascii_html(image: Image.Image, pattern: list, theme: str, merge_runs: bool = True, css_classes: bool = False, rng: random.Random = None) -> str:
+    image = resize_image(image, 80)
+    indices = glyph_indices(image, len(pattern))
 
     color_palette = COLOR_THEMES.get(theme, COLOR_THEMES['grayscale'])
+    colors = choice_indices(len(color_palette), indices.size, rng).reshape(indices.shape)
 
-    for row in pixels:
-        for pixel in row:
-            ascii_char = pattern[int(np.mean(pixel) / 255 * (len(pattern) - 1))]
-            color = random.choice(color_palette)
-            ascii_image_html += f"<span style='color:rgb({color[0]},{color[1]},{color[2]})'>{ascii_char}</span>"
-        ascii_image_html += "<br>"
-
-    ascii_image_html += "</div>"
-    return ascii_image_html
+    return render_ascii_html(indices, pattern, color_palette, colors, merge_runs, css_classes)
 
-def create_contours(image):
-    return image.filter(ImageFilter.FIND_EDGES)
+# Processed preview (PNG) and ASCII art for the Streamlit image page, served from the render cache when possible
+def render_uploaded_image(image_bytes, options):
+    filter_names = ('brightness', 'contrast', 'blur', 'sharpen', 'contours', 'flip_horizontal', 'flip_vertical')
+    preview_key = render_cache.key('preview', image_bytes, {name: options[name] for name in filter_names})
+    art_key = render_cache.key('html' if options['colorize'] else 'text', image_bytes, options)
+    preview, ascii_output = render_cache.get(preview_key), render_cache.get(art_key)
+    if preview is None or ascii_output is None:
+        image = Image.open(io.BytesIO(image_bytes))
+        # Apply filters to the image
+        image = apply_image_filters(image, options['brightness'], options['contrast'], options['blur'], options['sharpen'])
+        # Apply contour effect if selected
+        if options['contours']:
+            image = create_contours(image)
+        # Flip the image if requested
+        image = flip_image(image, options['flip_horizontal'], options['flip_vertical'])
+        preview_buffer = io.BytesIO()
+        image.convert('RGBA' if 'A' in image.getbands() else 'RGB').save(preview_buffer, format='PNG')
+        preview = preview_buffer.getvalue()
+        # Resize the image to the selected width and generate ASCII art
+        image_resized = resize_image(image, options['width'])
+        ascii_pattern = ASCII_PATTERNS[options['pattern']]
+        if options['colorize']:
+            # colors seeded from the cache key, so a cached page shows what a fresh render would
+            ascii_output = create_colorized_ascii_html(image_resized, ascii_pattern, options['theme'], rng=random.Random(art_key)).encode('utf-8')
+        else:
+            ascii_output = map_pixels_to_ascii(image_resized, ascii_pattern).encode('utf-8')
+        render_cache.set(preview_key, preview)
+        render_cache.set(art_key, ascii_output)
+    return preview, ascii_output.decode('utf-8')
 
 # Streamlit app for the ASCII art generator
 def run_streamlit_app():
@@ -144,37 +155,27 @@ def run_streamlit_app():
         uploaded_file = st.file_uploader(
             "Upload an image (JPEG/PNG)", type=["jpg", "jpeg", "png"])
         if uploaded_file:
-            image = Image.open(uploaded_file)
-            # Apply filters to the image
-            image = apply_image_filters(
-                image, brightness, contrast, apply_blur, apply_sharpen)
-            # Apply contour effect if selected
-            if apply_contours:
-                image = create_contours(image)
-            # Flip the image if requested
-            image = flip_image(image, flip_horizontal, flip_vertical)
+            options = {'brightness': brightness, 'contrast': contrast, 'blur': apply_blur, 'sharpen': apply_sharpen,
+                       'contours': apply_contours, 'flip_horizontal': flip_horizontal, 'flip_vertical': flip_vertical,
+                       'width': width, 'pattern': pattern_type, 'colorize': colorize, 'theme': color_theme}
+            preview, ascii_output = render_uploaded_image(uploaded_file.getvalue(), options)
             # Display the original processed image
-            st.image(image, caption="Processed Image", use_column_width=True)
-            # Resize the image based on the pattern type's aspect ratio
-            image_resized = resize_image(image, width, pattern_type)
-            # Generate ASCII art
-            ascii_pattern = ASCII_PATTERNS[pattern_type]
+            st.image(preview, caption="Processed Image", use_column_width=True)
             if colorize:
                 st.subheader("Colorized ASCII Art Preview:")
-                ascii_html = create_colorized_ascii_html(
-                    image_resized, ascii_pattern, color_theme)
-                st.markdown(ascii_html, unsafe_allow_html=True)
+                st.markdown(ascii_output, unsafe_allow_html=True)
             else:
                 st.subheader("Grayscale ASCII Art Preview:")
-                ascii_art = map_pixels_to_ascii(image_resized, ascii_pattern)
-                st.text(ascii_art)
+                st.text(ascii_output)
             # Download options
             if colorize:
-                st.download_button("Download ASCII Art as HTML", ascii_html,
+                st.download_button("Download ASCII Art as HTML", ascii_output,
                                    file_name="ascii_art.html", mime="text/html")
             else:
-                st.download_button("Download ASCII Art as Text", ascii_art,
+                st.download_button("Download ASCII Art as Text", ascii_output,
                                    file_name="ascii_art.txt", mime="text/plain")
+            cache_stats = render_cache.stats()
+            st.sidebar.caption(f"Render cache: {cache_stats['hits']} hits, {cache_stats['misses']} misses")
         # Instructions for the user
         st.markdown("""
             - 🎨 Use the **Settings** panel to customize your ASCII art with patterns, colors, and image filters.
@@ -202,7 +203,7 @@ def run_streamlit_app():
                     break
                 img_rgb = video_frame.to_ndarray(format="rgb24")
                 image = Image.fromarray(img_rgb)
-                image_resized = resize_image(image, 100, "basic")
+                image_resized = resize_image(image, 100)
                 ascii_art = map_pixels_to_ascii(
                     image_resized, ASCII_PATTERNS["basic"])
                 image_place.text(ascii_art)
@@ -221,43 +222,176 @@ def generate(
         sharpen: bool = typer.Option(False, help="Apply sharpen effect"),
         contours: bool = typer.Option(False, help="Apply contour effect"),
         invert: bool = typer.Option(False, help="Invert the image"),
-        output: str = typer.Option(None, help="Output file path")
+        output: str = typer.Option(None, help="Output file path"),
+        cache_dir: str = typer.Option(None, help="Directory of an on-disk render cache shared between runs"),
+        verbose: bool = typer.Option(False, help="Time the reduced-scale decode against a full-resolution decode")
 ):
     """Generate ASCII art from an image with various customization options."""
+    cache = RenderCache(disk_dir=cache_dir) if cache_dir else render_cache
 
     with Progress() as progress:
         task = progress.add_task("[green]Processing image...", total=100)
 
-        # Load and process the image
-        image = Image.open(image_path)
+        # Load the image, it is resized and filtered strip by strip while the lines are produced
+        with open(image_path, 'rb') as f:
+            image_bytes = f.read()
+        image = Image.open(io.BytesIO(image_bytes))
+        original_size = image.size
         progress.update(task, advance=20)
 
-        image = resize_image(image, width)
-        progress.update(task, advance=20)
+        line_count = max(ascii_size(image, width)[1], 1)
+        params = {'width': width, 'pattern': pattern, 'colorize': colorize, 'theme': theme, 'brightness': brightness,
+                  'contrast': contrast, 'blur': blur, 'sharpen': sharpen, 'contours': contours, 'invert': invert}
+        cache_key = cache.key('text', image_bytes, params)
+        cached = cache.get(cache_key)
 
-        image = apply_image_filters(image, brightness, contrast, blur, sharpen)
-        progress.update(task, advance=20)
+        def track(lines):
+            for line in lines:
+                progress.update(task, advance=80 / line_count)
+                yield line
 
-        if contours:
-            image = create_contours(image)
+        if cached is not None:
+            ascii_lines = track(cached.decode('utf-8').split("\n"))
+        else:
+            # colors seeded from the cache key, as the API does, so a cached render matches a fresh one
+            ascii_lines = track(cache.collect_lines(cache_key, stream_ascii_art(image, **params, rng=random.Random(cache_key))))
+        if output:
+            with open(output, 'w', encoding='utf-8') as f:
+                write_ascii_lines(f, ascii_lines)
+        else:
+            ascii_art = "\n".join(ascii_lines)
 
-        if invert:
-            image = ImageOps.invert(image.convert('RGB'))
-        progress.update(task, advance=20)
-
-        ascii_art = create_ascii_art(image, pattern, colorize, theme)
-        progress.update(task, advance=20)
+    if cached is not None:
+        console.print("[dim]Served from the render cache[/dim]")
+    elif image.size != original_size and verbose:
+        # measured: both decodes again, outside the render, best of three each
+        drafted, full = decode_seconds(image_bytes, width), decode_seconds(image_bytes)
+        saved = f"{1 - drafted / full:.0%} saved" if drafted < full else "no time saved"
+        console.print(f"[dim]Decoded {original_size[0]}x{original_size[1]} at {image.width}x{image.height}: "
+                      f"{drafted * 1000:.1f} ms against {full * 1000:.1f} ms for the full-resolution decode, {saved}[/dim]")
+    elif image.size != original_size:
+        # not timed, only the pixel counts; --verbose measures the decodes
+        saved = 1 - (image.width * image.height) / (original_size[0] * original_size[1])
+        console.print(f"[dim]Decoded {original_size[0]}x{original_size[1]} at {image.width}x{image.height}, "
+                      f"{saved:.0%} fewer pixels than the full-resolution decode (pixel-count estimate, --verbose times it)[/dim]")
 
     # Display or save the result
     if output:
-        with open(output, 'w', encoding='utf-8') as f:
-            f.write(ascii_art)
         console.print(f"ASCII art saved to {output}")
     else:
         console.print(Panel(ascii_art, title="ASCII Art", expand=False))
 
+def collect_image_paths(source):
+    """Expand a directory, glob pattern or manifest file (one path per line) into image paths."""
+    if os.path.isdir(source):
+        paths = [os.path.join(root, name) for root, _, names in os.walk(source) for name in names]
+        return sorted(path for path in paths if path.lower().endswith(IMAGE_EXTENSIONS)), source
+    if os.path.isfile(source) and not source.lower().endswith(IMAGE_EXTENSIONS):
+        base = os.path.dirname(source)
+        with open(source, encoding='utf-8') as f:
+            entries = [line.strip() for line in f]
+        paths = [os.path.join(base, entry) for entry in entries if entry and not entry.startswith('#')]
+    else:
+        paths = sorted(path for path in glob.glob(source, recursive=True) if os.path.isfile(path))
+    base = os.path.commonpath([os.path.dirname(os.path.abspath(path)) for path in paths]) if paths else '.'
+    return paths, base
+
+def plan_batch_jobs(source, output_dir, resume):
+    """Pair every input image with its output path and drop the ones a previous run already finished."""
+    image_paths, base = collect_image_paths(source)
+    jobs = []
+    for image_path in image_paths:
+        relative = os.path.relpath(os.path.abspath(image_path), os.path.abspath(base))
+        jobs.append((image_path, os.path.join(output_dir, os.path.splitext(relative)[0] + '.txt')))
+    pending_jobs = [job for job in jobs if not (resume and os.path.exists(job[1]))]
+    return pending_jobs, len(jobs) - len(pending_jobs)
+
+def convert_image_file(image_path, output_path, options):
+    """Convert one image for the batch command, returning an error message instead of raising."""
+    try:
+        with Image.open(image_path) as image:
+            os.makedirs(os.path.dirname(output_path) or '.', exist_ok=True)
+            # write next to the target and rename, so an interrupted run never leaves a finished-looking file
+            partial_path = output_path + '.part'
+            with open(partial_path, 'w', encoding='utf-8') as f:
+                write_ascii_lines(f, stream_ascii_art(image, **options))
+            os.replace(partial_path, output_path)
+        return None
+    except Exception as e:
+        if os.path.exists(output_path + '.part'):
+            os.remove(output_path + '.part')
+        return f"{type(e).__name__}: {e}"
+
+
+@app.command()
+def batch(
+        source: str = typer.Argument(..., help="Directory, glob pattern or manifest file with one image path per line"),
+        output_dir: str = typer.Option("ascii-art-output", help="Directory for the generated .txt files"),
+        width: int = typer.Option(100, help="Width of the ASCII art"),
+        pattern: str = typer.Option("basic", help="ASCII pattern to use"),
+        colorize: bool = typer.Option(False, help="Generate colorized ASCII art"),
+        theme: str = typer.Option("grayscale", help="Color theme for colorized output"),
+        brightness: float = typer.Option(1.0, help="Brightness adjustment"),
+        contrast: float = typer.Option(1.0, help="Contrast adjustment"),
+        blur: bool = typer.Option(False, help="Apply blur effect"),
+        sharpen: bool = typer.Option(False, help="Apply sharpen effect"),
+        contours: bool = typer.Option(False, help="Apply contour effect"),
+        invert: bool = typer.Option(False, help="Invert the image"),
+        workers: int = typer.Option(os.cpu_count() or 1, help="Number of worker processes"),
+        queue_size: int = typer.Option(4, help="Images queued per worker"),
+        resume: bool = typer.Option(True, help="Skip images whose output file already exists"),
+):
+    """Convert many images to ASCII art files in parallel."""
+    options = {'width': width, 'pattern': pattern, 'colorize': colorize, 'theme': theme, 'brightness': brightness,
+               'contrast': contrast, 'blur': blur, 'sharpen': sharpen, 'contours': contours, 'invert': invert}
+    pending_jobs, skipped = plan_batch_jobs(source, output_dir, resume)
+
+    converted = 0
+    failures = []
+    pool_broken = False
+    started = time.perf_counter()
+    with Progress() as progress, ProcessPoolExecutor(max_workers=workers) as pool:
+        task = progress.add_task("[green]Converting images...", total=len(pending_jobs))
+        job_iter = iter(pending_jobs)
+        in_flight = {}
+        # keep at most workers * queue_size images submitted, so huge inputs never pile up in memory
+        while not pool_broken:
+            while len(in_flight) < workers * queue_size:
+                job = next(job_iter, None)
+                if job is None:
+                    break
+                in_flight[pool.submit(convert_image_file, job[0], job[1], options)] = job[0]
+            if not in_flight:
+                break
+            done, _ = wait(in_flight, return_when=FIRST_COMPLETED)
+            for future in done:
+                image_path = in_flight.pop(future)
+                try:
+                    error = future.result()
+                except BrokenProcessPool as e:
+                    error, pool_broken = f"worker crashed: {e}", True
+                if error:
+                    failures.append((image_path, error))
+                else:
+                    converted += 1
+                progress.update(task, advance=1)
+        # a crashed worker stops the pool; finished files are kept and a rerun resumes from there
+        failures.extend((image_path, "not converted, worker pool stopped") for image_path in in_flight.values())
+    elapsed = time.perf_counter() - started
+
+    for image_path, error in failures:
+        console.print(f"[red]Failed[/red] {image_path}: {error}")
+    console.print(f"Converted {converted}, skipped {skipped}, failed {len(failures)} of {len(pending_jobs) + skipped} images "
+                  f"in {elapsed:.1f}s ({converted / elapsed if elapsed else 0:.1f} images/s)")
+    if failures:
+        raise typer.Exit(code=1)
+
 if __name__ == "__main__":
     if (len(sys.argv) > 1):
+        # `generate` stays the default command, so `python community-version.py <input_image>` keeps working
+        command_names = [command.name or command.callback.__name__ for command in app.registered_commands]
+        if sys.argv[1] not in command_names + ['--help', '--install-completion', '--show-completion']:
+            sys.argv.insert(1, 'generate')
         app()
     else:
         run_streamlit_app()
\ No newline at end of file
@@ -0,0 +1,12 @@
+import numpy as np
+
+
+# Pick pixels with a density that follows the edge map, so flat regions need fewer points.
+# Shared by pointillism-art.py and geometric-art.py; returns flat pixel indices into edges.
+def sample_edge_pixels(edges, num_points, edge_bias=0.8):
+    # Mix the normalized edge strength with a uniform share, so flat regions still get some points
+    weights = edges.ravel() / edges.sum() if edges.sum() > 0 else np.full(edges.size, 1 / edges.size)
+    cdf = np.cumsum(edge_bias * weights + (1 - edge_bias) / edges.size)
+
+    # Pick pixels by inverting the CDF in one vectorized draw
+    return np.minimum(np.searchsorted(cdf, np.random.rand(num_points) * cdf[-1], side="right"), edges.size - 1)
@@ -5,6 +5,7 @@ import threading
 import time
 from fastapi import FastAPI
 from fastapi_source.host.ascii_art_routes import router as ascii_router
+from fastapi_source.host.body_limit import BodySizeLimitMiddleware
 from starlette.routing import Route
 from fastapi_source.core.config import settings
 
@@ -22,6 +23,9 @@ app = FastAPI(
 # Register the ASCII art router
 app.include_router(ascii_router)
 
+# Refuse oversized uploads while they arrive, before they are spooled to disk
+app.add_middleware(BodySizeLimitMiddleware, max_bytes=settings.REQUEST_MAX_BYTES)
+
 # Convert all API routes to be case-insensitive
 for route in app.router.routes:
     if isinstance(route, Route):
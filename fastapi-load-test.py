@@ -0,0 +1,135 @@
+import argparse
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from typing import Dict, List, Optional
+
+import numpy as np
+import requests
+
+
+def percentile_ms(seconds: List[float], q: float) -> Optional[float]:
+    """Percentile of durations in milliseconds, None if there are none."""
+    return float(np.percentile(seconds, q) * 1000) if len(seconds) else None
+
+
+def format_ms(value: Optional[float]) -> str:
+    """Right aligned milliseconds, a dash for a missing value."""
+    return f"{value:8.1f}" if value is not None else f"{'-':>8}"
+
+
+def put_mosaic(url: str, image_bytes: bytes, block_size: int) -> Dict[str, float]:
+    """Send one mosaic request.
+
+    Args:
+        url (str): Base URL of the API.
+        image_bytes (bytes): Image to upload.
+        block_size (int): Sidelength of a mosaic block.
+
+    Returns:
+        Dict[str, float]: ``status`` and ``seconds`` of the request, status 0 for a connection error.
+    """
+    started = time.perf_counter()
+    try:
+        response = requests.put(f"{url}/AsciiArt/Mosaic", params={"block_size": block_size}, files={"image_file": ("image.png", image_bytes)}, timeout=120)
+        status = response.status_code
+    except requests.RequestException:
+        status = 0
+    return {"status": status, "seconds": time.perf_counter() - started}
+
+
+def probe_latencies(url: str, stop: threading.Event, interval: float = 0.05) -> List[float]:
+    """Time a cheap request over and over while the load runs, to see whether the event loop stays responsive.
+
+    Args:
+        url (str): Base URL of the API.
+        stop (threading.Event): Set when the load is done.
+        interval (float, optional): Pause between probes in seconds. Defaults to 0.05.
+
+    Returns:
+        List[float]: Seconds per probe.
+    """
+    latencies = []
+    while not stop.is_set():
+        started = time.perf_counter()
+        try:
+            requests.get(f"{url}/AsciiArt/Workers", timeout=120)
+        except requests.RequestException:
+            pass
+        latencies.append(time.perf_counter() - started)
+        stop.wait(interval)
+    return latencies
+
+
+def run_level(url: str, image_bytes: bytes, block_size: int, concurrency: int, request_count: int) -> Dict[str, Optional[float]]:
+    """Send ``request_count`` mosaic requests, ``concurrency`` at a time, with a latency probe alongside.
+
+    Args:
+        url (str): Base URL of the API.
+        image_bytes (bytes): Image to upload.
+        block_size (int): Sidelength of a mosaic block.
+        concurrency (int): Requests in flight at once.
+        request_count (int): Requests in total.
+
+    Returns:
+        Dict[str, Optional[float]]: Throughput, latency percentiles, status counts and probe latency.
+    """
+    stop = threading.Event()
+    with ThreadPoolExecutor(max_workers=1) as prober:
+        probe = prober.submit(probe_latencies, url, stop)
+        started = time.perf_counter()
+        with ThreadPoolExecutor(max_workers=concurrency) as pool:
+            results = list(pool.map(lambda _: put_mosaic(url, image_bytes, block_size), range(request_count)))
+        elapsed = time.perf_counter() - started
+        stop.set()
+        probes = probe.result()
+
+    statuses = np.array([result["status"] for result in results])
+    ok_seconds = np.array([result["seconds"] for result in results if result["status"] == 200])
+    return {
+        "concurrency": concurrency,
+        "ok_per_second": len(ok_seconds) / elapsed,
+        "p50_ms": percentile_ms(ok_seconds, 50),
+        "p99_ms": percentile_ms(ok_seconds, 99),
+        "ok": int(np.count_nonzero(statuses == 200)),
+        "busy_503": int(np.count_nonzero(statuses == 503)),
+        "timeout_504": int(np.count_nonzero(statuses == 504)),
+        "errors": int(np.count_nonzero((statuses != 200) & (statuses != 503) & (statuses != 504))),
+        "probe_p99_ms": percentile_ms(probes, 99),
+    }
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Load test the mosaic endpoint of a running API at increasing concurrency.")
+
+    parser.add_argument("--input", "-i", type=str, required=True, help="Path to the image to upload.")
+    parser.add_argument("--url", "-u", type=str, help="Base URL of the API. (default value: http://127.0.0.1:8000)", default="http://127.0.0.1:8000")
+    parser.add_argument("--block_size", "-b", type=int, help="Block size for the mosaic effect. (default value: 10)", default=10)
+    parser.add_argument("--concurrency", "-c", type=int, nargs="+", help="Concurrency levels to test. (default value: 1 2 4 8 16)", default=[1, 2, 4, 8, 16])
+    parser.add_argument("--requests", "-n", type=int, help="Requests per concurrency level. (default value: 50)", default=50)
+
+    args = parser.parse_args()
+
+    with open(args.input, "rb") as f:
+        image_bytes = f.read()
+
+    print(f"{'concurrency':>11} {'ok/s':>8} {'p50 ms':>8} {'p99 ms':>8} {'ok':>5} {'503':>5} {'504':>5} {'errors':>6} {'probe p99 ms':>12}")
+    for concurrency in args.concurrency:
+        level = run_level(args.url, image_bytes, args.block_size, concurrency, args.requests)
+        print(
+            f"{level['concurrency']:>11} {level['ok_per_second']:8.1f} {format_ms(level['p50_ms'])} {format_ms(level['p99_ms'])} "
+            f"{level['ok']:>5} {level['busy_503']:>5} {level['timeout_504']:>5} {level['errors']:>6} {format_ms(level['probe_p99_ms']):>12}"
+        )
+
+"""
+Feature:
+    Load test the mosaic endpoint of a running API, to see how throughput and latency scale with concurrency.
+    A cheap request is timed alongside the load; its latency shows whether the event loop stays responsive.
+
+Usage:
+    python3 fastapi-load-test.py --input <image_file_path> [--url <url>] [--concurrency <levels>] [--requests <count>]
+
+Example:
+    python3 fast-api-main.py   (in another terminal, with ASCII_ART_CACHE_MEMORY_BYTES=0 to measure rendering instead of the cache)
+    python3 fastapi-load-test.py --input example/ztm-logo.png --concurrency 1 4 16 64
+"""
@@ -0,0 +1,97 @@
+import io
+import os
+import shutil
+import tempfile
+from typing import BinaryIO, Optional, Union
+
+from PIL import Image, UnidentifiedImageError
+
+
+class UploadTooLargeError(Exception):
+    """Raised when an upload has more bytes or pixels than accepted."""
+
+
+class UnsupportedImageError(Exception):
+    """Raised when an upload is not an image Pillow can read."""
+
+
+def file_size(file: BinaryIO) -> int:
+    """Size of a seekable file in bytes, leaving its position where it was.
+
+    Args:
+        file (BinaryIO): Seekable file, e.g. the spooled temp file of an upload.
+
+    Returns:
+        int: Number of bytes in the file.
+    """
+    position = file.tell()
+    size = file.seek(0, os.SEEK_END)
+    file.seek(position)
+    return size
+
+
+def spool(source: BinaryIO, max_memory_bytes: int = 2**20) -> BinaryIO:
+    """Copy a stream into a temp file that only rolls over to disk once it outgrows ``max_memory_bytes``.
+
+    Args:
+        source (BinaryIO): Stream to copy, e.g. an entry of a zip file.
+        max_memory_bytes (int, optional): Bytes kept in memory before spilling to disk. Defaults to 1 MiB.
+
+    Returns:
+        BinaryIO: The copy, positioned at its start.
+    """
+    spooled = tempfile.SpooledTemporaryFile(max_size=max_memory_bytes)
+    shutil.copyfileobj(source, spooled, 2**16)
+    spooled.seek(0)
+    return spooled
+
+
+def inspect_image(file: BinaryIO, max_bytes: Optional[int] = None, max_pixels: Optional[int] = None) -> Image.Image:
+    """Open an uploaded image far enough to read its header, and check it before any pixel is decoded.
+
+    Only the header is parsed here, so the returned image is still lazy: JPEGs
+    can be drafted to a reduced scale before they are loaded.
+
+    Args:
+        file (BinaryIO): Seekable file holding the encoded image.
+        max_bytes (int, optional): Largest accepted file, None accepts any. Defaults to None.
+        max_pixels (int, optional): Largest accepted width * height, None leaves it to Pillow's own limit. Defaults to None.
+
+    Raises:
+        UploadTooLargeError: The file or its pixel dimensions are too large.
+        UnsupportedImageError: The file is not a readable image.
+
+    Returns:
+        Image.Image: The opened, not yet loaded image.
+    """
+    size = file_size(file)
+    if max_bytes is not None and size > max_bytes:
+        raise UploadTooLargeError(f"image file is {size} bytes, at most {max_bytes} are accepted")
+
+    file.seek(0)
+    try:
+        image = Image.open(file)
+    except Image.DecompressionBombError as e:
+        raise UploadTooLargeError(str(e)) from e
+    except UnidentifiedImageError as e:
+        raise UnsupportedImageError("not a supported image file") from e
+
+    width, height = image.size
+    if max_pixels is not None and width * height > max_pixels:
+        raise UploadTooLargeError(f"image is {width}x{height} pixels, at most {max_pixels} pixels are accepted")
+    return image
+
+
+def read_source(source: Union[bytes, BinaryIO]) -> BinaryIO:
+    """File object of an encoded image given as bytes or as a file, positioned at its start.
+
+    Args:
+        source (Union[bytes, BinaryIO]): Encoded image.
+
+    Returns:
+        BinaryIO: A file to open the image from.
+    """
+    if isinstance(source, (bytes, bytearray, memoryview)):
+        return io.BytesIO(source)
+    source.seek(0)
+    return source
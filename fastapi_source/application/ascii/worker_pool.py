@@ -0,0 +1,259 @@
+import asyncio
+import math
+import os
+import threading
+import time
+from collections import deque
+from concurrent.futures import Executor, ProcessPoolExecutor, ThreadPoolExecutor
+from typing import Any, AsyncIterator, Callable, Dict, Iterable, Iterator, Optional, Tuple
+
+from fastapi_source.core.config import settings
+
+# returned by next() on an exhausted iterator instead of raising StopIteration across threads
+_EXHAUSTED = object()
+
+
+class PoolBusyError(Exception):
+    """Raised when the worker pool already holds as many jobs as it may queue."""
+
+    def __init__(self, retry_after: int):
+        """Remember when a retry is likely to find room.
+
+        Args:
+            retry_after (int): Suggested wait in whole seconds.
+        """
+        super().__init__(f"worker pool is full, retry in {retry_after} s")
+        self.retry_after = retry_after
+
+
+class WorkerPool:
+    """Bounded pool that runs CPU-bound image work off the event loop.
+
+    Jobs run on a thread or process pool. At most ``max_pending`` jobs are
+    running or queued at once; further submissions fail right away with
+    ``PoolBusyError`` instead of piling up, so callers can answer 503 with a
+    Retry-After estimated from the recent job durations. A job that outlives
+    its timeout is abandoned by the caller but keeps its slot until it
+    really finishes, so timeouts cannot be used to overfill the pool.
+    Streamed renders are stepped through ``iterate``, one item per job,
+    holding a single slot for the whole stream.
+    """
+
+    def __init__(self, kind: str = "thread", workers: Optional[int] = None, max_pending: Optional[int] = None, timeout: Optional[float] = 30.0):
+        """Configure the pool, the executor itself is started on first use.
+
+        Args:
+            kind (str, optional): "thread" or "process". Defaults to "thread".
+            workers (int, optional): Number of workers, None uses the CPU count. Defaults to None.
+            max_pending (int, optional): Jobs running or queued at most, None allows four per worker. Defaults to None.
+            timeout (float, optional): Seconds a caller waits for a job by default, None waits forever. Defaults to 30.0.
+        """
+        if kind not in ("thread", "process"):
+            raise ValueError(f"unknown worker pool kind: {kind}")
+        self.kind = kind
+        self.workers = workers or os.cpu_count() or 1
+        self.max_pending = max_pending or 4 * self.workers
+        self.timeout = timeout
+        self.counters = {"submitted": 0, "completed": 0, "rejected": 0, "timeouts": 0, "failed": 0}
+        self._executor: Optional[Executor] = None
+        self._stream_executor: Optional[Executor] = None
+        self._lock = threading.Lock()
+        self._pending = 0
+        self._mean_seconds = 0.0
+
+    async def run(self, func: Callable[..., Any], *args: Any, timeout: Optional[float] = None) -> Any:
+        """Run ``func(*args)`` on a worker and wait for its result without blocking the event loop.
+
+        Args:
+            func (Callable[..., Any]): Function to run; module level, so that process workers can pickle it.
+            *args (Any): Its arguments.
+            timeout (float, optional): Seconds to wait, None uses the pool's default. Defaults to None.
+
+        Raises:
+            PoolBusyError: The pool is full.
+            asyncio.TimeoutError: The job did not finish in time.
+
+        Returns:
+            Any: What ``func`` returned.
+        """
+        executor = self._acquire()
+        queued = time.perf_counter()
+        try:
+            future = executor.submit(func, *args)
+        except BaseException:
+            self._finish(None, queued)
+            raise
+        future.add_done_callback(lambda done: self._finish(done, queued))
+
+        try:
+            return await asyncio.wait_for(asyncio.wrap_future(future), self.timeout if timeout is None else timeout)
+        except asyncio.TimeoutError:
+            with self._lock:
+                self.counters["timeouts"] += 1
+            raise
+
+    async def iterate(self, iterator: Iterator[Any], timeout: Optional[float] = None) -> AsyncIterator[Any]:
+        """Step a sync iterator on a worker thread, one item per job, without blocking the event loop.
+
+        The stream takes one slot when iteration starts and keeps it until the
+        iterator is exhausted or the iteration is closed, so streamed renders
+        count against ``max_pending`` like any other job. ``timeout`` bounds
+        the whole stream, a slow reader included. Generators cannot be sent to
+        another process, so a process pool steps them on threads of its own.
+
+        Args:
+            iterator (Iterator[Any]): Iterator to step, e.g. a generator that renders one strip per item.
+            timeout (float, optional): Seconds the whole stream may take, None uses the pool's default. Defaults to None.
+
+        Raises:
+            PoolBusyError: The pool is full, raised before the first item.
+            asyncio.TimeoutError: The stream did not finish in time.
+
+        Yields:
+            Any: The items of the iterator.
+        """
+        executor = self._acquire(threads=True)
+        queued = time.perf_counter()
+        timeout = self.timeout if timeout is None else timeout
+        deadline = None if timeout is None else time.monotonic() + timeout
+        step = None
+        try:
+            while True:
+                step = executor.submit(next, iterator, _EXHAUSTED)
+                remaining = None if deadline is None else max(0.0, deadline - time.monotonic())
+                try:
+                    item = await asyncio.wait_for(asyncio.wrap_future(step), remaining)
+                except asyncio.TimeoutError:
+                    with self._lock:
+                        self.counters["timeouts"] += 1
+                    raise
+                if item is _EXHAUSTED:
+                    return
+                yield item
+        finally:
+            # the slot is freed once no step of this stream runs any more
+            last = step
+            if last is None or last.done():
+                self._close_stream(iterator, last, queued)
+            else:
+                last.add_done_callback(lambda done: self._close_stream(iterator, done, queued))
+
+    async def map_unordered(self, func: Callable[..., Any], items: Iterable[Tuple[Any, ...]], window: Optional[int] = None) -> AsyncIterator[Tuple[int, Any, Optional[BaseException]]]:
+        """Run ``func(*args)`` for every item, a few at a time, and yield the results as they finish.
+
+        At most ``window`` items are in the pool at once, so one large batch
+        cannot take every slot. An item turned away because the pool is full
+        waits until one of the batch's own jobs finishes (or, with none
+        running, for the Retry-After estimate) and is submitted again.
+        ``items`` is consumed lazily, so a generator only builds the
+        arguments of the items about to be submitted.
+
+        Args:
+            func (Callable[..., Any]): Function to run, see ``run``.
+            items (Iterable[Tuple[Any, ...]]): Arguments of every call.
+            window (int, optional): Items in the pool at once, None uses the number of workers. Defaults to None.
+
+        Yields:
+            Tuple[int, Any, Optional[BaseException]]: Index of the item, its result, and the error it raised or None.
+        """
+        window = window or self.workers
+        limit = window
+        upcoming = enumerate(items)
+        waiting = deque()
+        running = {}
+        try:
+            while True:
+                while len(running) < limit:
+                    # items turned away come first, then the next one is pulled from the iterable
+                    index, args = waiting.popleft() if waiting else next(upcoming, (None, None))
+                    if index is None:
+                        break
+                    running[asyncio.ensure_future(self.run(func, *args))] = (index, args)
+                if not running:
+                    break
+                done, _ = await asyncio.wait(running, return_when=asyncio.FIRST_COMPLETED)
+                busy = None
+                for task in done:
+                    index, args = running.pop(task)
+                    error = task.exception()
+                    if isinstance(error, PoolBusyError):
+                        waiting.appendleft((index, args))
+                        busy = error
+                        continue
+                    limit = min(window, limit + 1)
+                    yield index, None if error else task.result(), error
+                if busy is not None:
+                    # back off to what the pool accepted; with nothing of ours running, wait before asking again
+                    limit = max(len(running), 1)
+                    if not running:
+                        await asyncio.sleep(min(busy.retry_after, 1.0))
+        finally:
+            for task in running:
+                task.cancel()
+
+    def stats(self) -> Dict[str, Any]:
+        """Counters and the current load of the pool.
+
+        Returns:
+            Dict[str, Any]: Counters plus ``kind``, ``workers``, ``pending``, ``max_pending`` and ``mean_seconds``.
+        """
+        with self._lock:
+            return {
+                **self.counters,
+                "kind": self.kind,
+                "workers": self.workers,
+                "pending": self._pending,
+                "max_pending": self.max_pending,
+                "mean_seconds": round(self._mean_seconds, 4),
+            }
+
+    def shutdown(self) -> None:
+        """Stop the workers, waiting for the jobs that are already running."""
+        with self._lock:
+            executors = (self._executor, self._stream_executor)
+            self._executor = self._stream_executor = None
+        for executor in executors:
+            if executor is not None:
+                executor.shutdown(cancel_futures=True)
+
+    def _acquire(self, threads: bool = False) -> Executor:
+        # take a slot and return the executor to submit to; threads=True always gives a thread pool
+        with self._lock:
+            if self._pending >= self.max_pending:
+                self.counters["rejected"] += 1
+                raise PoolBusyError(self._retry_after())
+            self._pending += 1
+            self.counters["submitted"] += 1
+            if self._executor is None:
+                self._executor = ThreadPoolExecutor(self.workers, thread_name_prefix="ascii-worker") if self.kind == "thread" else ProcessPoolExecutor(self.workers)
+            if not threads or self.kind == "thread":
+                return self._executor
+            if self._stream_executor is None:
+                self._stream_executor = ThreadPoolExecutor(self.workers, thread_name_prefix="ascii-stream")
+            return self._stream_executor
+
+    def _close_stream(self, iterator: Iterator[Any], future, queued: float) -> None:
+        close = getattr(iterator, "close", None)
+        if close is not None:
+            close()
+        self._finish(future, queued)
+
+    def _finish(self, future, queued: float) -> None:
+        with self._lock:
+            self._pending -= 1
+            if future is None or future.cancelled():
+                return
+            if future.exception() is not None:
+                self.counters["failed"] += 1
+                return
+            self.counters["completed"] += 1
+            # time in the pool, queueing included, smoothed over roughly the last ten jobs
+            seconds = time.perf_counter() - queued
+            self._mean_seconds = seconds if self.counters["completed"] == 1 else 0.9 * self._mean_seconds + 0.1 * seconds
+
+    def _retry_after(self) -> int:
+        # recent jobs spent about this long in the pool, queueing included, so a slot should free up by then
+        return max(1, math.ceil(self._mean_seconds))
+
+
+worker_pool = WorkerPool(settings.WORKER_POOL_KIND, settings.WORKER_POOL_WORKERS, settings.WORKER_POOL_MAX_PENDING, settings.WORKER_POOL_TIMEOUT)
@@ -1,3 +1,6 @@
+import os
+
+
 class Settings:
     PROJECT_NAME_EN_US: str = "Ascii-Art Api"
     VERSION: str = "1.0.0"
@@ -5,4 +8,20 @@ class Settings:
     #router setting
     ROUTER_NAME_Object_Detection, ROUTER_Description_Object_Detection = ("AsciiArt", "Enjoy 😎😎😎")
 
-settings = Settings()
\ No newline at end of file
+    #render cache setting: ASCII_ART_CACHE_MEMORY_BYTES, ASCII_ART_CACHE_DIR and ASCII_ART_CACHE_DISK_BYTES are read by render_cache.py, as the CLI shares it
+
+    #worker pool setting, image work runs here instead of on the event loop
+    WORKER_POOL_KIND: str = os.getenv("ASCII_ART_WORKER_KIND", "thread")  #thread or process
+    WORKER_POOL_WORKERS: int = int(os.getenv("ASCII_ART_WORKERS", 0)) or None  #0 uses the CPU count
+    WORKER_POOL_MAX_PENDING: int = int(os.getenv("ASCII_ART_MAX_PENDING", 0)) or None  #0 allows four jobs per worker
+    WORKER_POOL_TIMEOUT: float = float(os.getenv("ASCII_ART_WORK_TIMEOUT", 30))  #per job, or per whole stream for /Text and /Html
+
+    #batch setting
+    BATCH_MAX_ITEMS: int = int(os.getenv("ASCII_ART_BATCH_MAX_ITEMS", 256))
+
+    #upload setting, checked before any pixel is decoded
+    UPLOAD_MAX_BYTES: int = int(os.getenv("ASCII_ART_UPLOAD_MAX_BYTES", 16 * 2**20))  #one image file, or one zip entry uncompressed
+    UPLOAD_MAX_PIXELS: int = int(os.getenv("ASCII_ART_UPLOAD_MAX_PIXELS", 40_000_000))  #width * height of one image
+    REQUEST_MAX_BYTES: int = int(os.getenv("ASCII_ART_REQUEST_MAX_BYTES", 256 * 2**20))  #whole request body, counted while it arrives
+
+settings = Settings()
@@ -1,25 +1,342 @@
 import io
-from fastapi.responses import StreamingResponse
-from fastapi import APIRouter, UploadFile, File, Query
+import os
+import json
+import base64
+import random
+import asyncio
+import zipfile
+from functools import partial
+from typing import AsyncIterator, BinaryIO, Callable, Iterable, Iterator, List, Literal, Optional, Set, Tuple, Union
+from PIL import Image, UnidentifiedImageError
+from fastapi.concurrency import run_in_threadpool
+from fastapi.responses import Response, StreamingResponse
+from fastapi import APIRouter, UploadFile, File, Query, Header, HTTPException, Depends
 from fastapi_source.core.config import settings
-from fastapi_source.application.ascii.ascii_service import get_mosaic_image
+from ascii_engine import ASCII_PATTERNS, COLOR_THEMES
+from ascii_pipeline import stream_ascii_art, stream_ascii_html
+from fastapi_source.application.ascii.ascii_service import MOSAIC_FORMATS, render_mosaic, render_mosaic_png
+from fastapi_source.application.ascii.image_ingest import UnsupportedImageError, UploadTooLargeError, inspect_image, spool
+from render_cache import render_cache
+from fastapi_source.application.ascii.worker_pool import PoolBusyError, worker_pool
 
 router = APIRouter(prefix=f'/{settings.ROUTER_NAME_Object_Detection}', 
                    tags=[settings.ROUTER_NAME_Object_Detection])
 
 @router.put("/Mosaic", summary = "Make your image mosaic! 😁", 
-            description = 'Upload your image file, and make it mosaic. 😃',
+            description = 'Upload your image file, and make it mosaic. 😃 '
+                          'Pick the output with format: RGBA PNG (compress_level 1 encodes fast, 9 small), indexed PNG (palette) or WebP '
+                          '(lossless, or lossy with a quality). The Server-Timing header reports the encoding time, Content-Length the size.',
             response_class = StreamingResponse,
-            responses = {200: {"content": {"image/png": {}}}})
+            responses = {200: {"content": {"image/png": {}, "image/webp": {}}},
+                         400: {"description": "Not a supported image file"},
+                         413: {"description": "The image file or its pixel dimensions are too large"},
+                         503: {"description": "Too many images in progress, retry after the Retry-After header's seconds"},
+                         504: {"description": "The image took too long to process"}})
 async def detect(image_file: UploadFile = File(..., description="upload image file"),
-                 block_size: int=Query(description="Sidelength of a mosaic block. Default value=10", default=10)):
+                 block_size: int=Query(description="Sidelength of a mosaic block. Default value=10", default=10, ge=1, le=1000),
+                 format: Literal["png", "palette", "webp"] = Query(description="Output format: RGBA PNG, indexed PNG or WebP", default="png"),
+                 quality: Optional[int] = Query(None, ge=0, le=100, description="WebP only: lossy quality, leave it out for lossless WebP"),
+                 compress_level: int = Query(6, ge=0, le=9, description="PNG formats only: zlib level, 1 is fastest, 9 smallest")):
     
-    contents = await image_file.read()
-    result_image = get_mosaic_image(contents, block_size)
-    
-    #save images to bytes
-    img_byte_arr = io.BytesIO()
-    result_image.save(img_byte_arr, format="PNG")
-    img_byte_arr.seek(0) 
-    
-    return StreamingResponse(img_byte_arr, media_type = "image/png")
\ No newline at end of file
+    #size and dimensions come from the spooled upload and the image header, nothing is decoded yet;
+    #the header check and the content hash run in the threadpool, the event loop only does I/O
+    _, cache_key = await run_in_threadpool(checked_upload, image_file.file, partial(mosaic_cache_key, block_size=block_size, format=format,
+                                                                                    quality=quality, compress_level=compress_level))
+
+    #reuse an earlier render of the same image and settings
+    image_bytes = render_cache.get(cache_key)
+    if image_bytes is None:
+        #decode, mosaic and encode on the worker pool, the event loop keeps serving other requests
+        try:
+            image_bytes, encode_seconds = await worker_pool.run(render_mosaic, worker_input(image_file.file), block_size, format, quality, compress_level)
+        except PoolBusyError as e:
+            raise HTTPException(status_code=503, detail=str(e), headers={"Retry-After": str(e.retry_after)}) from e
+        except asyncio.TimeoutError:
+            raise HTTPException(status_code=504, detail="image processing timed out") from None
+        render_cache.set(cache_key, image_bytes)
+        server_timing = f"encode;dur={encode_seconds * 1000:.1f}"
+    else:
+        server_timing = 'cache;desc="hit"'
+
+    return StreamingResponse(io.BytesIO(image_bytes), media_type = MOSAIC_FORMATS[format],
+                             headers = {"Content-Length": str(len(image_bytes)), "Server-Timing": server_timing})
+
+def mosaic_cache_key(file: BinaryIO, block_size: int, format: str = "png", quality: Optional[int] = None, compress_level: int = 6) -> str:
+    """Cache key of a mosaic, leaving out the encoder options the format ignores."""
+    return render_cache.key("mosaic", file, {"block_size": block_size, "format": format,
+                                             "quality": quality if format == "webp" else None,
+                                             "compress_level": compress_level if format != "webp" else None})
+
+def checked_image(file: BinaryIO) -> Image.Image:
+    """Check an upload's size and pixel dimensions and open it lazily, answering 413 or 400 before any pixel is decoded."""
+    try:
+        return inspect_image(file, settings.UPLOAD_MAX_BYTES, settings.UPLOAD_MAX_PIXELS)
+    except UploadTooLargeError as e:
+        raise HTTPException(status_code=413, detail=str(e)) from e
+    except UnsupportedImageError as e:
+        raise HTTPException(status_code=400, detail=str(e)) from e
+
+def checked_upload(file: BinaryIO, cache_key: Callable[[BinaryIO], str]) -> Tuple[Image.Image, str]:
+    """checked_image and the cache key of an upload; both read the whole file, so routes call this through run_in_threadpool."""
+    return checked_image(file), cache_key(file)
+
+def inspected_mosaic_key(file: BinaryIO, block_size: int) -> Tuple[Optional[str], Optional[str]]:
+    """Cache key of a batch item, or the reason it is rejected; run through run_in_threadpool like checked_upload."""
+    try:
+        inspect_image(file, settings.UPLOAD_MAX_BYTES, settings.UPLOAD_MAX_PIXELS)
+    except (UploadTooLargeError, UnsupportedImageError) as e:
+        return None, str(e)
+    return mosaic_cache_key(file, block_size), None
+
+def worker_input(file: BinaryIO) -> Union[BinaryIO, bytes]:
+    """The upload itself for thread workers; process workers cannot share an open file, so they get its bytes."""
+    if worker_pool.kind == "thread":
+        return file
+    file.seek(0)
+    return file.read()
+
+class ZipStream:
+    """Write-only file that hands out what a ZipFile wrote so far; ZipFile switches to data descriptors for it."""
+
+    def __init__(self):
+        self.chunks = []
+
+    def write(self, data: bytes) -> int:
+        self.chunks.append(bytes(data))
+        return len(data)
+
+    def flush(self):
+        pass
+
+    def drain(self) -> bytes:
+        data, self.chunks = b"".join(self.chunks), []
+        return data
+
+def batch_items(image_files: List[UploadFile], archive: Optional[UploadFile]) -> List[Tuple[str, BinaryIO]]:
+    """Names and spooled files of every image of a batch, from the multipart files and the entries of a zip."""
+    items = [(image_file.filename or f"image-{index}", image_file.file) for index, image_file in enumerate(image_files)]
+    if archive is not None:
+        try:
+            with zipfile.ZipFile(archive.file) as zf:
+                entries = [info for info in zf.infolist() if not info.is_dir() and not info.filename.startswith("__MACOSX/")]
+                if len(items) + len(entries) > settings.BATCH_MAX_ITEMS:
+                    raise HTTPException(status_code=413, detail=f"a batch holds at most {settings.BATCH_MAX_ITEMS} images")
+                for info in entries:
+                    #the declared size is checked before inflating anything
+                    if info.file_size > settings.UPLOAD_MAX_BYTES:
+                        raise HTTPException(status_code=413, detail=f"{info.filename} is larger than {settings.UPLOAD_MAX_BYTES} bytes")
+                    with zf.open(info) as entry:
+                        items.append((info.filename, spool(entry)))
+        except zipfile.BadZipFile as e:
+            raise HTTPException(status_code=400, detail="archive is not a zip file") from e
+    if not items:
+        raise HTTPException(status_code=422, detail="send images as image_files or a zip as archive")
+    if len(items) > settings.BATCH_MAX_ITEMS:
+        raise HTTPException(status_code=413, detail=f"a batch holds at most {settings.BATCH_MAX_ITEMS} images")
+    return items
+
+async def mosaic_results(items: List[Tuple[str, BinaryIO]], block_size: int) -> AsyncIterator[Tuple[int, Optional[bytes], Optional[str], bool]]:
+    """Mosaic every item, rejected and cached ones first, the rest on the worker pool; yields (index, png, error, cached) as each finishes."""
+    try:
+        keys, todo = {}, []
+        for index, (_, file) in enumerate(items):
+            key, error = await run_in_threadpool(inspected_mosaic_key, file, block_size)
+            if error is not None:
+                yield index, None, error, False
+                continue
+            keys[index] = key
+            png_bytes = render_cache.get(keys[index])
+            if png_bytes is None:
+                todo.append(index)
+            else:
+                yield index, png_bytes, None, True
+        async for position, png_bytes, error in worker_pool.map_unordered(render_mosaic_png, ((worker_input(items[index][1]), block_size) for index in todo)):
+            index = todo[position]
+            if error is None:
+                render_cache.set(keys[index], png_bytes)
+                yield index, png_bytes, None, False
+            else:
+                yield index, None, batch_error(error), False
+    finally:
+        for _, file in items:
+            file.close()
+
+def batch_error(error: BaseException) -> str:
+    if isinstance(error, UnidentifiedImageError):
+        return "not a supported image file"
+    if isinstance(error, asyncio.TimeoutError):
+        return "timed out"
+    return f"{type(error).__name__}: {error}"
+
+async def ndjson_batch(items: List[Tuple[str, BinaryIO]], block_size: int) -> AsyncIterator[bytes]:
+    async for index, png_bytes, error, cached in mosaic_results(items, block_size):
+        if error is None:
+            result = {"index": index, "name": items[index][0], "status": "ok", "cached": cached, "png_base64": base64.b64encode(png_bytes).decode("ascii")}
+        else:
+            result = {"index": index, "name": items[index][0], "status": "error", "error": error}
+        yield (json.dumps(result) + "\n").encode("utf-8")
+
+def zip_entry_name(filename: str, index: int, names: Set[str]) -> str:
+    #only the base name of a client filename is kept, so no entry can point into another directory
+    stem = os.path.splitext(os.path.basename(filename.replace("\\", "/")))[0].strip(".") or f"image-{index}"
+    name, suffix = f"{stem}.png", 0
+    while name in names:
+        suffix += 1
+        name = f"{stem}-{index}.png" if suffix == 1 else f"{stem}-{index}-{suffix}.png"
+    return name
+
+async def zip_batch(items: List[Tuple[str, BinaryIO]], block_size: int) -> AsyncIterator[bytes]:
+    stream, names, errors = ZipStream(), set(), []
+    #PNGs are compressed already, so entries are stored as they are
+    with zipfile.ZipFile(stream, "w", zipfile.ZIP_STORED) as zf:
+        async for index, png_bytes, error, _ in mosaic_results(items, block_size):
+            if error is not None:
+                errors.append({"index": index, "name": items[index][0], "error": error})
+                continue
+            name = zip_entry_name(items[index][0], index, names)
+            names.add(name)
+            zf.writestr(name, png_bytes)
+            yield stream.drain()
+        if errors:
+            zf.writestr("errors.json", json.dumps(errors, indent=2))
+    yield stream.drain()
+
+@router.put("/Mosaic/Batch", summary = "Make many images mosaic at once! 📦",
+            description = f'Upload up to {settings.BATCH_MAX_ITEMS} images as image_files, or as a zip in archive, and make them all mosaic. '
+                          'The images are processed concurrently and every result is streamed as soon as it is ready: '
+                          'one JSON line per image (PNG in base64) with output=ndjson, or a zip of PNGs with output=zip.',
+            response_class = StreamingResponse,
+            responses = {200: {"content": {"application/x-ndjson": {}, "application/zip": {}}},
+                         413: {"description": "Too many images, a zip entry that is too large, or a request body over the limit"}})
+async def mosaic_batch(image_files: List[UploadFile] = File(None, description="upload image files"),
+                       archive: Optional[UploadFile] = File(None, description="or upload a zip of image files"),
+                       block_size: int = Query(description="Sidelength of a mosaic block. Default value=10", default=10, ge=1, le=1000),
+                       output: Literal["ndjson", "zip"] = Query(description="Stream results as JSON lines or as a zip", default="ndjson")):
+
+    items = batch_items(image_files or [], archive)
+    if output == "zip":
+        return StreamingResponse(zip_batch(items, block_size), media_type="application/zip",
+                                 headers={"Content-Disposition": 'attachment; filename="mosaic.zip"'})
+    return StreamingResponse(ndjson_batch(items, block_size), media_type="application/x-ndjson")
+
+@router.get("/Cache", summary = "Render cache statistics 📊",
+            description = 'Hit/miss counters and sizes of the render cache.')
+async def cache_stats():
+    return render_cache.stats()
+
+@router.get("/Workers", summary = "Worker pool statistics 📊",
+            description = 'Load and job counters of the image worker pool.')
+async def worker_stats():
+    return worker_pool.stats()
+
+def generate_options(width: int = Query(100, ge=1, le=2000, description="Width of the ASCII art"),
+                     pattern: str = Query("basic", description=f"ASCII pattern to use: {', '.join(ASCII_PATTERNS)}"),
+                     colorize: bool = Query(False, description="Generate colorized ASCII art"),
+                     theme: str = Query("grayscale", description=f"Color theme for colorized output: {', '.join(COLOR_THEMES)}"),
+                     brightness: float = Query(1.0, description="Brightness adjustment"),
+                     contrast: float = Query(1.0, description="Contrast adjustment"),
+                     blur: bool = Query(False, description="Apply blur effect"),
+                     sharpen: bool = Query(False, description="Apply sharpen effect"),
+                     contours: bool = Query(False, description="Apply contour effect"),
+                     invert: bool = Query(False, description="Invert the image")) -> dict:
+    """The options of the CLI's `generate` command, checked before any streaming starts."""
+    if pattern not in ASCII_PATTERNS:
+        raise HTTPException(status_code=422, detail=f"unknown pattern: {pattern}")
+    if theme not in COLOR_THEMES:
+        raise HTTPException(status_code=422, detail=f"unknown theme: {theme}")
+    return {'width': width, 'pattern': pattern, 'colorize': colorize, 'theme': theme, 'brightness': brightness,
+            'contrast': contrast, 'blur': blur, 'sharpen': sharpen, 'contours': contours, 'invert': invert}
+
+def etag_matches(if_none_match: Optional[str], etag: str) -> bool:
+    """Whether an If-None-Match header names the ETag (weak comparison, as for caching)."""
+    if not if_none_match:
+        return False
+    if if_none_match.strip() == "*":
+        return True
+    return etag in (tag.strip().removeprefix("W/") for tag in if_none_match.split(","))
+
+def text_chunks(lines: Iterable[str]) -> Iterator[str]:
+    """Lines joined by newlines, one chunk per line."""
+    for index, line in enumerate(lines):
+        yield "\n" + line if index else line
+
+def encoded(chunks: Iterable[str]) -> Iterator[bytes]:
+    for chunk in chunks:
+        yield chunk.encode("utf-8")
+
+async def stream_render(cache_key: str, render: Iterable[str], media_type: str, etag: str) -> StreamingResponse:
+    """Stream a render chunk by chunk, from the cache if it is there, caching it otherwise."""
+    cached = render_cache.get(cache_key)
+    if cached is not None:
+        body = (cached[start:start + 2**16] for start in range(0, len(cached), 2**16))
+    else:
+        #the sync generator is stepped on the worker pool, holding one slot until the stream ends
+        body = await first_chunk_ready(worker_pool.iterate(encoded(render_cache.collect_chunks(cache_key, render))))
+    return StreamingResponse(body, media_type=media_type, headers={"ETag": etag})
+
+async def first_chunk_ready(chunks: AsyncIterator[bytes]) -> AsyncIterator[bytes]:
+    """Wait for the first chunk before the response starts, so a full pool or a timeout still get 503 or 504.
+
+    Later timeouts abort the stream; the worker pool's timeout covers the whole stream, a slow reader included.
+    """
+    try:
+        first = await chunks.__anext__()
+    except StopAsyncIteration:
+        first = b""
+    except PoolBusyError as e:
+        raise HTTPException(status_code=503, detail=str(e), headers={"Retry-After": str(e.retry_after)}) from e
+    except asyncio.TimeoutError:
+        raise HTTPException(status_code=504, detail="image processing timed out") from None
+
+    async def body():
+        yield first
+        async for chunk in chunks:
+            yield chunk
+
+    return body()
+
+@router.put("/Text", summary = "Turn your image into ASCII art! 🖼️",
+            description = 'Upload your image file and get its ASCII art, streamed line by line. Takes the options of the CLI\'s generate command. '
+                          'Send the ETag of an earlier response as If-None-Match to get 304 instead of the same art again. '
+                          'Colorized art picks its theme colors from a generator seeded with the ETag, so the same image and options always give the same colors. '
+                          'Rendering runs on the bounded worker pool; the whole stream must finish within its timeout.',
+            response_class = StreamingResponse,
+            responses = {200: {"content": {"text/plain": {}}}, 304: {"description": "Same image and options as the If-None-Match ETag"},
+                         400: {"description": "Not a supported image file"}, 413: {"description": "The image file or its pixel dimensions are too large"},
+                         503: {"description": "Too many images in progress, retry after the Retry-After header's seconds"},
+                         504: {"description": "The image took too long to process"}})
+async def ascii_text(image_file: UploadFile = File(..., description="upload image file"),
+                     options: dict = Depends(generate_options),
+                     if_none_match: Optional[str] = Header(None)):
+
+    #read the header only; pixels are decoded strip by strip while the response streams, JPEGs at a reduced scale.
+    #the ETag is the content address of the render: hash of the image and of the options
+    image, cache_key = await run_in_threadpool(checked_upload, image_file.file, partial(render_cache.key, "text", params=options))
+    etag = f'"{cache_key}"'
+    if etag_matches(if_none_match, etag):
+        return Response(status_code=304, headers={"ETag": etag})
+
+    #the theme colors are random, so they are seeded from the cache key too: a cached or 304 response is exactly what a fresh render would give
+    return await stream_render(cache_key, text_chunks(stream_ascii_art(image, **options, rng=random.Random(cache_key))), "text/plain; charset=utf-8", etag)
+
+@router.put("/Html", summary = "Turn your image into colorized HTML ASCII art! 🌈",
+            description = 'Upload your image file and get colorized ASCII art as HTML, streamed row by row. Takes the options of the CLI\'s generate command, '
+                          'colorize is implied. Send the ETag of an earlier response as If-None-Match to get 304 instead of the same art again. '
+                          'Theme colors are picked from a generator seeded with the ETag, so the same image and options always give the same colors. '
+                          'Rendering runs on the bounded worker pool; the whole stream must finish within its timeout.',
+            response_class = StreamingResponse,
+            responses = {200: {"content": {"text/html": {}}}, 304: {"description": "Same image and options as the If-None-Match ETag"},
+                         400: {"description": "Not a supported image file"}, 413: {"description": "The image file or its pixel dimensions are too large"},
+                         503: {"description": "Too many images in progress, retry after the Retry-After header's seconds"},
+                         504: {"description": "The image took too long to process"}})
+async def ascii_html(image_file: UploadFile = File(..., description="upload image file"),
+                     options: dict = Depends(generate_options),
+                     if_none_match: Optional[str] = Header(None)):
+
+    options.pop('colorize')
+    image, cache_key = await run_in_threadpool(checked_upload, image_file.file, partial(render_cache.key, "html", params=options))
+    etag = f'"{cache_key}"'
+    if etag_matches(if_none_match, etag):
+        return Response(status_code=304, headers={"ETag": etag})
+
+    return await stream_render(cache_key, stream_ascii_html(image, **options, rng=random.Random(cache_key)), "text/html; charset=utf-8", etag)
@@ -0,0 +1,47 @@
+from fastapi import HTTPException
+from starlette.responses import JSONResponse
+from starlette.types import ASGIApp, Message, Receive, Scope, Send
+
+
+class BodySizeLimitMiddleware:
+    """Refuse request bodies larger than ``max_bytes`` while they arrive, before they are spooled or parsed.
+
+    A declared Content-Length over the limit is answered with 413 right
+    away; a chunked body is counted as it is received and the request fails
+    with 413 as soon as it goes over.
+    """
+
+    def __init__(self, app: ASGIApp, max_bytes: int):
+        """Wrap an ASGI app.
+
+        Args:
+            app (ASGIApp): The wrapped app.
+            max_bytes (int): Largest accepted request body.
+        """
+        self.app = app
+        self.max_bytes = max_bytes
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        detail = f"request body is larger than {self.max_bytes} bytes"
+        content_length = dict(scope["headers"]).get(b"content-length")
+        if content_length is not None and content_length.isdigit() and int(content_length) > self.max_bytes:
+            await JSONResponse({"detail": detail}, status_code=413, headers={"Connection": "close"})(scope, receive, send)
+            return
+
+        received = 0
+
+        async def limited_receive() -> Message:
+            nonlocal received
+            message = await receive()
+            if message["type"] == "http.request":
+                received += len(message.get("body", b""))
+                if received > self.max_bytes:
+                    # raised inside the body parser, so the app answers it like any HTTPException
+                    raise HTTPException(status_code=413, detail=detail)
+            return message
+
+        await self.app(scope, limited_receive, send)
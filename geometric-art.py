@@ -1,9 +1,21 @@
 import sys
 
-import matplotlib.pyplot as plt
 import numpy as np
 from PIL import Image
 from scipy.spatial import Delaunay
+from skimage import color, filters
+
+from edge_sampling import sample_edge_pixels
+
+BACKENDS = ("raster", "matplotlib")
+COLOR_MODES = ("center", "average")
+SAMPLINGS = ("uniform", "edges")
+
+
+# Reject an unknown option value instead of silently falling back to a default
+def check_choice(name, value, choices):
+    if value not in choices:
+        raise ValueError(f"{name} must be one of {', '.join(choices)}, got {value!r}")
 
 
 # Load and preprocess the image
@@ -23,13 +35,90 @@ def generate_points(image, num_points=500):
     return points
 
 
+# Detect edges in the image using Sobel filter, on colors weighted by alpha so the outline of a logo counts
+def detect_edges(image):
+    rgb = image[:, :, :3] / 255
+    if image.shape[2] == 4:
+        rgb = rgb * (image[:, :, 3:] / 255)
+    return filters.sobel(color.rgb2gray(rgb))
+
+
+# Generate points with a density that follows the edge map, so flat regions need fewer points
+def generate_edge_weighted_points(image, num_points=500, edge_bias=0.8):
+    height, width, _ = image.shape
+    pixel = sample_edge_pixels(detect_edges(image), num_points, edge_bias)
+    points = np.stack([pixel % width, pixel // width], axis=1)
+    # Add corners to ensure triangulation covers the entire image
+    points = np.vstack([points, [[0, 0], [0, height], [width, 0], [width, height]]])
+    return points
+
+
 # Create Delaunay triangulation from points
 def create_delaunay_triangulation(points):
     return Delaunay(points)
 
 
-# Draw triangles on the image using the Delaunay triangulation
+# Color of each triangle, sampled at its center in one gather
+def triangle_colors(image, points, triangulation):
+    centers = points[triangulation.simplices].mean(axis=1).astype(int)
+    return image[centers[:, 1], centers[:, 0]]
+
+
+# Triangle index of every pixel, -1 outside the triangulation
+def triangle_labels(triangulation, shape, chunk_rows=256):
+    height, width = shape[:2]
+    labels = np.empty((height, width), dtype=np.intp)
+    # matplotlib's imshow puts pixel centers on integer coordinates, so pixels are looked up there
+    xs = np.arange(width)
+    for top in range(0, height, chunk_rows):
+        ys = np.arange(top, min(top + chunk_rows, height))
+        grid = np.stack(np.broadcast_arrays(xs[None, :], ys[:, None]), axis=-1).reshape(-1, 2)
+        labels[ys[0] : ys[-1] + 1] = triangulation.find_simplex(grid).reshape(len(ys), width)
+    return labels
+
+
+# Mean color of the pixels inside each triangle, from one bincount per channel
+def triangle_average_colors(image, labels, triangle_count):
+    inside = labels >= 0
+    flat_labels = labels[inside]
+    pixels = image[inside].astype(np.float64)
+    counts = np.bincount(flat_labels, minlength=triangle_count)
+    alpha_sums = np.bincount(flat_labels, weights=pixels[:, 3], minlength=triangle_count)
+
+    # colors are weighted by alpha, so transparent pixels do not darken the edges of the logo
+    colors = np.zeros((triangle_count, 4))
+    covered = alpha_sums > 0
+    for channel in range(3):
+        sums = np.bincount(flat_labels, weights=pixels[:, channel] * pixels[:, 3], minlength=triangle_count)
+        colors[covered, channel] = sums[covered] / alpha_sums[covered]
+    colors[counts > 0, 3] = alpha_sums[counts > 0] / counts[counts > 0]
+    return np.rint(colors).astype(np.uint8), counts
+
+
+# Fill every triangle at the image's native resolution without per-triangle drawing
+def render_geometric_art(image, points, triangulation, color_mode="center"):
+    check_choice("color_mode", color_mode, COLOR_MODES)
+    rgba_image = image if image.shape[2] == 4 else np.dstack([image, np.full(image.shape[:2], 255, dtype=np.uint8)])
+    labels = triangle_labels(triangulation, image.shape)
+    colors = triangle_colors(rgba_image, points, triangulation)
+
+    if color_mode == "average":
+        # triangles too thin to contain a pixel center keep their center color
+        average_colors, counts = triangle_average_colors(rgba_image, labels, len(triangulation.simplices))
+        colors = np.where((counts > 0)[:, None], average_colors, colors)
+
+    # index -1 (outside every triangle) picks the extra transparent color and keeps the image
+    colors = np.vstack([colors, np.zeros((1, 4), dtype=colors.dtype)])
+    triangles = Image.fromarray(colors[labels], "RGBA")
+
+    # translucent triangle colors are blended over the image like matplotlib patches over imshow
+    return Image.alpha_composite(Image.fromarray(rgba_image, "RGBA"), triangles)
+
+
+# Draw triangles on the image as matplotlib patches, kept as a preview of the raster output
 def draw_geometric_art(image, points, triangulation, output_path=None):
+    import matplotlib.pyplot as plt
+
     fig, ax = plt.subplots()
     ax.set_aspect("equal")
     ax.imshow(image)
@@ -52,30 +141,55 @@ def draw_geometric_art(image, points, triangulation, output_path=None):
 
 
 # Main function to convert image to geometric art
-def create_geometric_art(image_path, output_path=None, num_points=500, resize_factor=1):
-    # Load image and generate points
+def create_geometric_art(image_path, output_path=None, num_points=500, resize_factor=1, backend="raster", color_mode="center", sampling="uniform"):
+    check_choice("backend", backend, BACKENDS)
+    check_choice("color_mode", color_mode, COLOR_MODES)
+    check_choice("sampling", sampling, SAMPLINGS)
+
+    # Load image and generate points, either uniformly or concentrated along the edges
     image = load_image(image_path, resize_factor)
-    points = generate_points(image, num_points)
+    points = generate_edge_weighted_points(image, num_points) if sampling == "edges" else generate_points(image, num_points)
 
     # Create triangulation and draw art
     triangulation = create_delaunay_triangulation(points)
-    draw_geometric_art(image, points, triangulation, output_path)
+    if backend == "matplotlib":
+        draw_geometric_art(image, points, triangulation, output_path)
+        return
+
+    result_img = render_geometric_art(image, points, triangulation, color_mode)
+    if output_path:
+        result_img.save(output_path, "PNG")
+    else:
+        import matplotlib.pyplot as plt
+
+        plt.imshow(result_img)
+        plt.axis("off")
+        plt.show()
 
 
 if __name__ == "__main__":
     import sys
 
+    usage = f"Usage: python3 geometric-art.py <input_image> [output_image] [num_points] [{'|'.join(COLOR_MODES)}] [{'|'.join(SAMPLINGS)}]"
     if len(sys.argv) < 2:
-        print("Usage: python3 geometric-art.py <input_image> [output_image] [num_points]")
+        print(usage)
         sys.exit(1)
 
     image_file_path = sys.argv[1]
     output_file_path = sys.argv[2] if len(sys.argv) > 2 else None
     num_points = int(sys.argv[3]) if len(sys.argv) > 3 else 500
+    color_mode = sys.argv[4] if len(sys.argv) > 4 else "center"
+    sampling = sys.argv[5] if len(sys.argv) > 5 else "uniform"
+    if color_mode not in COLOR_MODES or sampling not in SAMPLINGS:
+        print(f"Unknown color mode or sampling: {color_mode} {sampling}")
+        print(usage)
+        sys.exit(1)
 
-    create_geometric_art(image_file_path, output_file_path, num_points)
+    create_geometric_art(image_file_path, output_file_path, num_points, color_mode=color_mode, sampling=sampling)
 
 # Example usage:
 # python3 geometric-art.py example/ztm-logo.png
 # python3 geometric-art.py example/ztm-logo.png geometric-art.png
 # python3 geometric-art.py example/ztm-logo.png geometric-art.png 1000
+# python3 geometric-art.py example/ztm-logo.png geometric-art.png 1000 average
+# python3 geometric-art.py example/ztm-logo.png geometric-art.png 300 average edges
@@ -0,0 +1,627 @@
+import queue
+import sys
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from typing import BinaryIO, Dict, Iterable, Optional, Tuple
+
+import cv2
+import numpy as np
+from rich.progress import BarColumn, MofNCompleteColumn, Progress, TextColumn, TimeElapsedColumn
+
+from ascii_engine import NEWLINE
+
+SPACE = ord(" ")
+
+# flows draw printable ASCII without the space, like chr(np.random.choice(range(33, 127)))
+FLOW_GLYPHS: Tuple[int, int] = (33, 127)
+
+
+def glyph_grid(image_ascii: str) -> np.ndarray:
+    """Turn ASCII art into a grid of character codes, padding short lines with spaces.
+
+    Args:
+        image_ascii (str): ASCII art, rows separated by ``\\n``.
+
+    Returns:
+        np.ndarray: ``(height, width)`` ``uint8`` grid.
+    """
+    lines = image_ascii.split("\n")
+    grid = np.full((len(lines), max(len(line) for line in lines)), SPACE, dtype=np.uint8)
+    for y, line in enumerate(lines):
+        grid[y, : len(line)] = np.frombuffer(line.encode("ascii"), dtype=np.uint8)
+    return grid
+
+
+def grid_to_text(grid: np.ndarray) -> str:
+    """Turn a grid of character codes back into newline separated text with one decode.
+
+    Args:
+        grid (np.ndarray): ``(height, width)`` ``uint8`` grid.
+
+    Returns:
+        str: The text, rows separated by ``\\n``.
+    """
+    height, width = grid.shape
+    buffer = np.empty((height, width + 1), dtype=np.uint8)
+    buffer[:, :width] = grid
+    buffer[:, width] = NEWLINE
+    return buffer.ravel()[:-1].tobytes().decode("ascii")
+
+
+def random_glyphs(count: int) -> np.ndarray:
+    """Draw the random characters of a whole frame in one call.
+
+    Args:
+        count (int): Number of characters.
+
+    Returns:
+        np.ndarray: ``uint8`` character codes in ``FLOW_GLYPHS``.
+    """
+    return np.random.randint(*FLOW_GLYPHS, size=count, dtype=np.uint8)
+
+
+def flow_masks(column_states: np.ndarray, height: int, column_lengths: Optional[np.ndarray] = None) -> Tuple[np.ndarray, np.ndarray]:
+    """Cells covered by the flows, from broadcast comparisons of the row index with the column state.
+
+    Args:
+        column_states (np.ndarray): Row of the flow head per column, -1 means no flow.
+        height (int): Number of rows.
+        column_lengths (np.ndarray, optional): Trail length per column, None lets the trail reach the top. Defaults to None.
+
+    Returns:
+        Tuple[np.ndarray, np.ndarray]: ``(height, width)`` head mask and trail mask, the trail includes the head.
+    """
+    rows = np.arange(height)[:, None]
+    active = column_states >= 0
+    trail = active & (rows <= column_states)
+    if column_lengths is not None:
+        trail &= rows >= column_states - column_lengths
+    head = active & (rows == column_states)
+    return head, trail
+
+
+def advance_flows(column_states: np.ndarray, column_lengths: np.ndarray, height: int, speed: int = 2) -> np.ndarray:
+    """Move every flow down in place and stop the ones whose trail left the screen.
+
+    Args:
+        column_states (np.ndarray): Row of the flow head per column, -1 means no flow.
+        column_lengths (np.ndarray): Trail length per column.
+        height (int): Number of rows.
+        speed (int, optional): Rows per frame. Defaults to 2.
+
+    Returns:
+        np.ndarray: Mask of the columns whose flow just finished.
+    """
+    active = column_states != -1
+    column_states[active] += speed
+    finished = active & (column_states >= height + column_lengths)
+    column_states[finished] = -1
+    return finished
+
+
+def blend_coverage(background: np.ndarray, color: np.ndarray, coverage: np.ndarray) -> np.ndarray:
+    """Blend packed colors over packed pixels by glyph coverage, rounding like OpenCV's anti-aliased text.
+
+    Pixels are ``uint32`` with one byte per channel. Each channel becomes
+    ``(background * (255 - coverage) + color * coverage + 127) // 255``,
+    computed in ``uint16`` with the division done by shifts.
+
+    Args:
+        background (np.ndarray): ``uint32`` packed pixels.
+        color (np.ndarray): ``uint32`` packed colors, one per pixel.
+        coverage (np.ndarray): ``uint8`` coverage, one per pixel.
+
+    Returns:
+        np.ndarray: ``uint32`` packed blended pixels.
+    """
+    coverage = coverage.astype(np.uint16)[:, None]
+    channels = background.view(np.uint8).reshape(-1, 4) * (255 - coverage) + color.view(np.uint8).reshape(-1, 4) * coverage + 128
+    channels += channels >> 8
+    channels >>= 8
+    return channels.astype(np.uint8).view(np.uint32).ravel()
+
+
+def pack_colors(colors: np.ndarray) -> np.ndarray:
+    """Pack BGR colors into ``uint32`` pixels, one byte per channel.
+
+    Args:
+        colors (np.ndarray): ``(..., 3)`` ``uint8`` colors.
+
+    Returns:
+        np.ndarray: ``uint32`` array of the leading shape.
+    """
+    colors = np.asarray(colors, dtype=np.uint8)
+    packed = np.zeros(colors.shape[:-1] + (4,), dtype=np.uint8)
+    packed[..., :3] = colors
+    return packed.view(np.uint32)[..., 0]
+
+
+class GlyphAtlas:
+    """Pre-rasterized ``cv2.putText`` glyphs for drawing whole character grids at once.
+
+    Every character is drawn once into a coverage mask and cut into cell sized
+    blocks, one per cell offset its strokes reach. Glyphs are tinted once per
+    palette color and cached, so the bulk of a frame is a single gather of
+    tinted cells. The strokes that spill into neighbouring cells are then
+    blended in the order in which ``putText`` would have drawn them, so the
+    result matches drawing every cell with ``cv2.putText`` pixel for pixel.
+    Frames are assembled as packed ``uint32`` pixels, which keeps those
+    scattered updates to one machine word per pixel.
+    """
+
+    def __init__(self, palette: np.ndarray, cell_size: int = 10, font_face: int = cv2.FONT_HERSHEY_PLAIN, font_scale: float = 1, thickness: int = 1):
+        """Rasterize the printable ASCII characters.
+
+        Args:
+            palette (np.ndarray): ``(colors, 3)`` BGR colors that cells can be drawn in.
+            cell_size (int, optional): Width and height of a cell in pixels. Defaults to 10.
+            font_face (int, optional): OpenCV font. Defaults to cv2.FONT_HERSHEY_PLAIN.
+            font_scale (float, optional): OpenCV font scale. Defaults to 1.
+            thickness (int, optional): Stroke thickness. Defaults to 1.
+        """
+        self.palette = pack_colors(np.reshape(palette, (-1, 3)))
+        self.cell_size = cell_size
+        (text_width, text_height), baseline = cv2.getTextSize("W", font_face, font_scale, thickness)
+        margin = -(-(max(text_width, text_height + baseline) + thickness) // cell_size) + 1
+
+        # a cell's text origin is its bottom-left corner; draw each glyph in the middle of a large canvas
+        size = (2 * margin + 1) * cell_size
+        coverage = np.zeros((256, size, size), dtype=np.uint8)
+        for code in range(SPACE, 127):
+            cv2.putText(coverage[code], chr(code), (margin * cell_size, (margin + 1) * cell_size), font_face, font_scale, 255, thickness)
+        blocks = coverage.reshape(256, 2 * margin + 1, cell_size, 2 * margin + 1, cell_size).transpose(1, 3, 0, 2, 4)
+
+        # what a glyph paints into its own cell, tinted on demand per (color, glyph) pair
+        self.coverage = np.ascontiguousarray(blocks[margin, margin])
+        self.tiles = np.empty((0, cell_size, cell_size), dtype=np.uint32)
+        self.tile_rows = np.full(len(self.palette) * 256, -1, dtype=np.int64)
+        self._tiles_lock = threading.Lock()  # bands of one frame may be drawn on several threads
+
+        # strokes reaching the cell dy rows down and dx columns right, as sparse per-glyph lists
+        self.spills = {}
+        for dy, dx in zip(*np.nonzero(blocks.any(axis=(2, 3, 4)))):
+            if (dy, dx) != (margin, margin):
+                glyph, rows, columns = np.nonzero(blocks[dy, dx])
+                counts = np.bincount(glyph, minlength=256)
+                self.spills[int(dy) - margin, int(dx) - margin] = (counts, np.cumsum(counts) - counts, rows, columns, blocks[dy, dx][glyph, rows, columns])
+
+    def render(self, glyphs: np.ndarray, color_indices: np.ndarray) -> np.ndarray:
+        """Draw a grid of characters.
+
+        Args:
+            glyphs (np.ndarray): ``(height, width)`` ``uint8`` character codes.
+            color_indices (np.ndarray): Palette index per cell, broadcastable to the grid.
+
+        Returns:
+            np.ndarray: ``(height * cell_size, width * cell_size, 3)`` ``uint8`` BGR image.
+        """
+        height, width = glyphs.shape
+        cell = self.cell_size
+        image = np.zeros((height * cell, width * cell), dtype=np.uint32)
+        self.draw(image, glyphs, color_indices)
+        return cv2.cvtColor(image.view(np.uint8).reshape(height * cell, width * cell, 4), cv2.COLOR_BGRA2BGR)
+
+    def draw(self, image: np.ndarray, glyphs: np.ndarray, color_indices: np.ndarray, cells: Optional[np.ndarray] = None) -> None:
+        """Draw a grid of characters into packed pixels, redrawing only some cells if asked.
+
+        Args:
+            image (np.ndarray): ``(height * cell_size, width * cell_size)`` ``uint32`` packed pixels, drawn in place.
+            glyphs (np.ndarray): ``(height, width)`` ``uint8`` character codes.
+            color_indices (np.ndarray): Palette index per cell, broadcastable to the grid.
+            cells (np.ndarray, optional): ``(height, width)`` mask of the cells to redraw from scratch, None redraws all. Defaults to None.
+        """
+        height, width = glyphs.shape
+        cell = self.cell_size
+        color_indices = np.broadcast_to(color_indices, glyphs.shape)
+        pixels = image.ravel()
+        blocks = image.reshape(height, cell, width, cell)
+        if cells is None:
+            image[...] = 0
+        else:
+            cell_y, cell_x = np.nonzero(cells)
+            blocks[cell_y, :, cell_x, :] = 0
+
+        # putText draws row by row: spills from cells above and to the left land before a cell's own glyph
+        offsets = sorted(self.spills, key=lambda offset: -(offset[0] * width + offset[1]))
+        spilled = np.zeros(len(pixels), dtype=bool)
+        for offset in offsets:
+            if offset[0] * width + offset[1] > 0:
+                spilled[self._blend_spill(pixels, offset, glyphs, color_indices, cells)] = True
+        spilled = np.flatnonzero(spilled)
+        under = pixels[spilled]
+
+        # every cell's own glyph over black, tinted once per (color, glyph) pair
+        if cells is None:
+            rows = self._tile_rows(color_indices.astype(np.int64) * 256 + glyphs)
+            blocks[...] = self.tiles[rows].transpose(0, 2, 1, 3)
+        else:
+            rows = self._tile_rows(color_indices[cell_y, cell_x].astype(np.int64) * 256 + glyphs[cell_y, cell_x])
+            blocks[cell_y, :, cell_x, :] = self.tiles[rows]
+
+        # pixels that already held a spill are blended again over what was under them
+        if len(spilled):
+            pixel_y, pixel_x = np.divmod(spilled, width * cell)
+            cell_y, cell_x = pixel_y // cell, pixel_x // cell
+            coverage = self.coverage[glyphs[cell_y, cell_x], pixel_y % cell, pixel_x % cell]
+            pixels[spilled] = blend_coverage(under, self.palette[color_indices[cell_y, cell_x]], coverage)
+
+        for offset in offsets:
+            if offset[0] * width + offset[1] < 0:
+                self._blend_spill(pixels, offset, glyphs, color_indices, cells)
+
+    def reach(self, cells: np.ndarray) -> np.ndarray:
+        """Cells whose pixels change when the given cells change, i.e. the cells plus everywhere their glyphs spill.
+
+        Args:
+            cells (np.ndarray): ``(height, width)`` mask of changed cells.
+
+        Returns:
+            np.ndarray: ``(height, width)`` mask of the cells to redraw.
+        """
+        height, width = cells.shape
+        reached = cells.copy()
+        for dy, dx in self.spills:
+            reached[max(dy, 0) : height + min(dy, 0), max(dx, 0) : width + min(dx, 0)] |= cells[max(-dy, 0) : height - max(dy, 0), max(-dx, 0) : width - max(dx, 0)]
+        return reached
+
+    def _tile_rows(self, keys: np.ndarray) -> np.ndarray:
+        rows = self.tile_rows[keys]
+        if (rows < 0).any():
+            with self._tiles_lock:
+                rows = self.tile_rows[keys]
+                new_keys = np.unique(keys[rows < 0])
+                coverage = self.coverage[new_keys % 256]
+                colors = np.repeat(self.palette[new_keys // 256], coverage[0].size)
+                tiles = blend_coverage(np.zeros_like(colors), colors, coverage.ravel())
+                # the tiles are appended before their rows are published, so readers never see a row past the end
+                first_row = len(self.tiles)
+                self.tiles = np.concatenate([self.tiles, tiles.reshape(coverage.shape)])
+                self.tile_rows[new_keys] = np.arange(len(new_keys)) + first_row
+                rows = self.tile_rows[keys]
+        return rows
+
+    def _blend_spill(self, pixels: np.ndarray, offset: Tuple[int, int], glyphs: np.ndarray, color_indices: np.ndarray, cells: Optional[np.ndarray] = None) -> np.ndarray:
+        dy, dx = offset
+        height, width = glyphs.shape
+        cell = self.cell_size
+        counts, starts, rows, columns, coverage = self.spills[offset]
+
+        # source cells whose glyph reaches the cell at the offset, if that cell is being redrawn
+        top, left = max(-dy, 0), max(-dx, 0)
+        sources = glyphs[top : height - max(dy, 0), left : width - max(dx, 0)]
+        reaching = counts[sources] > 0
+        if cells is not None:
+            reaching &= cells[max(dy, 0) : height + min(dy, 0), max(dx, 0) : width + min(dx, 0)]
+        source_y, source_x = np.divmod(np.flatnonzero(reaching), sources.shape[1])
+        source_y += top
+        source_x += left
+        source_glyphs = glyphs[source_y, source_x]
+
+        # one entry per painted pixel, as a flat index into the image
+        entry_counts = counts[source_glyphs]
+        total = int(entry_counts.sum())
+        entries = np.repeat(starts[source_glyphs] - (np.cumsum(entry_counts) - entry_counts), entry_counts) + np.arange(total)
+        image_width = width * cell
+        origins = (source_y + dy) * cell * image_width + (source_x + dx) * cell
+        indices = np.repeat(origins, entry_counts) + rows[entries] * image_width + columns[entries]
+
+        colors = np.repeat(self.palette[color_indices[source_y, source_x]], entry_counts)
+        pixels[indices] = blend_coverage(pixels[indices], colors, coverage[entries])
+        return indices
+
+
+class GlyphCanvas:
+    """A frame kept between calls so that each new frame only redraws the cells that changed.
+
+    A cell is redrawn when its character or color differs from the previous
+    frame, together with the neighbours its old or new glyph spills into. A
+    frame without changes is returned as is, without drawing anything. The
+    grid can be split into horizontal bands drawn on worker threads: a band
+    only writes the pixels of its own cells, so the bands never overlap.
+    """
+
+    def __init__(self, atlas: GlyphAtlas, shape: Tuple[int, int], workers: int = 1):
+        """Start from a blank frame.
+
+        Args:
+            atlas (GlyphAtlas): Glyphs to draw with.
+            shape (Tuple[int, int]): ``(height, width)`` of the character grid.
+            workers (int, optional): Threads drawing bands of rows in parallel, 1 draws on the calling thread. Defaults to 1.
+        """
+        height, width = shape
+        cell = atlas.cell_size
+        self.atlas = atlas
+        self.glyphs = np.full(shape, SPACE, dtype=np.uint8)
+        self.color_indices = np.zeros(shape, dtype=np.int64)
+        self.pixels = np.zeros((height * cell, width * cell), dtype=np.uint32)
+        self.image = np.zeros((height * cell, width * cell, 3), dtype=np.uint8)
+        edges = np.linspace(0, height, min(workers, height) + 1).astype(int)
+        self.bands = list(zip(edges[:-1], edges[1:]))
+        self.pool = ThreadPoolExecutor(max_workers=len(self.bands)) if len(self.bands) > 1 else None
+
+    def update(self, glyphs: np.ndarray, color_indices: np.ndarray) -> np.ndarray:
+        """Bring the frame up to date with a grid of characters.
+
+        Args:
+            glyphs (np.ndarray): ``(height, width)`` ``uint8`` character codes.
+            color_indices (np.ndarray): Palette index per cell, broadcastable to the grid.
+
+        Returns:
+            np.ndarray: ``(height * cell_size, width * cell_size, 3)`` ``uint8`` BGR image, the same buffer on every call.
+        """
+        changed = (glyphs != self.glyphs) | (color_indices != self.color_indices)
+        if changed.any():
+            self.glyphs[...] = glyphs
+            self.color_indices[...] = color_indices
+            cells = self.atlas.reach(changed)
+            if self.pool is None:
+                self._draw_band(cells, 0, len(cells))
+            else:
+                list(self.pool.map(lambda band: self._draw_band(cells, *band), self.bands))
+        return self.image
+
+    def close(self) -> None:
+        """Stop the worker threads."""
+        if self.pool is not None:
+            self.pool.shutdown()
+
+    def _draw_band(self, cells: np.ndarray, start: int, stop: int) -> None:
+        band = np.zeros_like(cells)
+        band[start:stop] = cells[start:stop]
+        if band.any():
+            self.atlas.draw(self.pixels, self.glyphs, self.color_indices, band)
+            cell = self.atlas.cell_size
+            pixels = self.pixels[start * cell : stop * cell]
+            cv2.cvtColor(pixels.view(np.uint8).reshape(*pixels.shape, 4), cv2.COLOR_BGRA2BGR, dst=self.image[start * cell : stop * cell])
+
+
+def frame_delta(previous: np.ndarray, frame: np.ndarray) -> Tuple[np.ndarray, np.ndarray]:
+    """The cells of a grid that changed since the previous frame, updating ``previous`` in place.
+
+    Args:
+        previous (np.ndarray): ``(height, width)`` grid of the previous frame.
+        frame (np.ndarray): ``(height, width)`` grid of the new frame.
+
+    Returns:
+        Tuple[np.ndarray, np.ndarray]: Flat indices of the changed cells and their new character codes.
+    """
+    changed = np.flatnonzero(previous != frame)
+    codes = frame.ravel()[changed]
+    previous.ravel()[changed] = codes
+    return changed, codes
+
+
+def apply_delta(grid: np.ndarray, delta: Tuple[np.ndarray, np.ndarray]) -> np.ndarray:
+    """Write a frame delta into a grid in place.
+
+    Args:
+        grid (np.ndarray): ``(height, width)`` grid of the previous frame.
+        delta (Tuple[np.ndarray, np.ndarray]): Flat indices and character codes from ``frame_delta``.
+
+    Returns:
+        np.ndarray: The same grid, now holding the new frame.
+    """
+    changed, codes = delta
+    grid.ravel()[changed] = codes
+    return grid
+
+
+def write_video(images: Iterable[np.ndarray], output_path: str, frame_rate: int = 30, queue_depth: int = 8, total: Optional[int] = None) -> int:
+    """Encode frames with ``cv2.VideoWriter`` on a writer thread while the caller keeps producing the next ones.
+
+    Frames are copied into a bounded queue, so the images may reuse one
+    buffer and memory never holds more than ``queue_depth`` frames. Progress
+    and the encoding rate are shown live.
+
+    Args:
+        images (Iterable[np.ndarray]): BGR ``uint8`` frames of equal size.
+        output_path (str): Path of the MP4 file.
+        frame_rate (int, optional): Frames per second of the video. Defaults to 30.
+        queue_depth (int, optional): Frames waiting for the encoder at most. Defaults to 8.
+        total (int, optional): Number of frames, if known, for the progress bar. Defaults to None.
+
+    Returns:
+        int: Number of frames written.
+    """
+    frames = queue.Queue(maxsize=queue_depth)
+    errors = []
+    written = 0
+
+    with Progress(TextColumn("{task.description}"), BarColumn(), MofNCompleteColumn(), TextColumn("{task.fields[fps]:.1f} fps"), TimeElapsedColumn()) as progress:
+        task = progress.add_task("[green]Writing video...", total=total, fps=0.0)
+
+        def drain():
+            nonlocal written
+            video = None
+            started = time.perf_counter()
+            while (image := frames.get()) is not None:
+                if errors:
+                    continue  # keep taking frames so the producer never blocks on a full queue
+                try:
+                    if video is None:
+                        video = cv2.VideoWriter(output_path, cv2.VideoWriter_fourcc(*"mp4v"), frame_rate, (image.shape[1], image.shape[0]))
+                    video.write(image)
+                except Exception as error:
+                    errors.append(error)
+                    continue
+                written += 1
+                progress.update(task, advance=1, fps=written / (time.perf_counter() - started))
+            if video is not None:
+                video.release()
+
+        writer = threading.Thread(target=drain, name="video-writer")
+        writer.start()
+        try:
+            for image in images:
+                if errors:
+                    break
+                frames.put(image.copy())
+        finally:
+            frames.put(None)
+            writer.join()
+
+    if errors:
+        raise errors[0]
+    return written
+
+
+def ansi_delta(glyphs: np.ndarray, color_indices: np.ndarray, cells: np.ndarray, palette: np.ndarray, current_color: int = -1, bridge: int = 3) -> Tuple[bytes, int]:
+    """Escape sequences that redraw only the given cells of a terminal, with as few bytes as possible.
+
+    Cells are written row by row. The cursor is only moved where the written
+    cells are not adjacent, relatively within a row, and gaps of up to
+    ``bridge`` unchanged cells in the current color are simply written over,
+    which is shorter than jumping them. A truecolor code is only sent when the
+    color changes; spaces keep whatever color is set.
+
+    Args:
+        glyphs (np.ndarray): ``(height, width)`` ``uint8`` character codes.
+        color_indices (np.ndarray): ``(height, width)`` palette index per cell.
+        cells (np.ndarray): ``(height, width)`` mask of the cells to redraw.
+        palette (np.ndarray): ``(colors, 3)`` RGB colors.
+        current_color (int, optional): Palette index the terminal is set to, -1 if unknown. Defaults to -1.
+        bridge (int, optional): Longest gap of unchanged cells written over instead of skipped. Defaults to 3.
+
+    Returns:
+        Tuple[bytes, int]: The escape sequences and the palette index the terminal is set to afterwards.
+    """
+    height, width = glyphs.shape
+    cells = cells.copy()
+    y, x = np.nonzero(cells)
+    if len(y) > 1 and bridge > 0:
+        # unchanged cells between two changed ones are written too, if they are blank or share the left cell's color
+        gaps = x[1:] - x[:-1] - 1
+        bridged = (y[1:] == y[:-1]) & (gaps >= 1) & (gaps <= bridge)
+        for step in range(1, bridge + 1):
+            column = np.minimum(x[:-1] + step, width - 1)
+            fits = (glyphs[y[:-1], column] == SPACE) | (color_indices[y[:-1], column] == color_indices[y[:-1], x[:-1]])
+            bridged &= (step > gaps) | fits
+        for step in range(1, bridge + 1):
+            inside = bridged & (step <= gaps)
+            cells[y[:-1][inside], x[:-1][inside] + step] = True
+        y, x = np.nonzero(cells)
+    if not len(y):
+        return b"", current_color
+
+    # the cursor sits right after the previous cell unless the cells are apart
+    previous_y = np.concatenate([[-1], y[:-1]])
+    previous_x = np.concatenate([[-2], x[:-1]])
+    moves = (y != previous_y) | (x != previous_x + 1)
+
+    # spaces do not care about the color, every other cell needs its own
+    colors = color_indices[y, x]
+    drawn = glyphs[y, x] != SPACE
+    last_drawn = np.maximum.accumulate(np.where(drawn, np.arange(len(y)), -1))
+    color_before = np.concatenate([[current_color], np.where(last_drawn >= 0, colors[np.maximum(last_drawn, 0)], current_color)[:-1]])
+    color_changes = drawn & (colors != color_before)
+
+    text = glyphs[y, x].tobytes()
+    escapes = [f"\x1b[38;2;{red};{green};{blue}m".encode("ascii") for red, green, blue in np.asarray(palette, dtype=int)]
+    parts = []
+    starts = np.flatnonzero(moves | color_changes)
+    for start, stop in zip(starts, np.append(starts[1:], len(y))):
+        if moves[start]:
+            if y[start] == previous_y[start]:
+                parts.append(b"\x1b[%dC" % (x[start] - previous_x[start] - 1))
+            else:
+                parts.append(b"\x1b[%d;%dH" % (y[start] + 1, x[start] + 1))
+        if color_changes[start]:
+            parts.append(escapes[colors[start]])
+        parts.append(text[start:stop])
+    if drawn.any():
+        current_color = int(colors[drawn][-1])
+    return b"".join(parts), current_color
+
+
+def play_in_terminal(
+    frames: Iterable[Tuple[np.ndarray, np.ndarray]],
+    palette: np.ndarray,
+    shape: Tuple[int, int],
+    frame_rate: int = 30,
+    stream: Optional[BinaryIO] = None,
+    status_interval: Optional[float] = 0.5,
+) -> Dict[str, float]:
+    """Play frames in a terminal at a fixed frame rate, sending only the cells that changed.
+
+    The screen is diffed against what the terminal already shows, so a frame
+    that is dropped because the terminal fell behind (e.g. over a slow SSH
+    link) is simply folded into the next one that is drawn. The last frame is
+    always drawn. While playing, a status line below the art shows the bytes
+    of the last frame and the average over the last second of drawn frames;
+    its own bytes are not counted in the returned figures.
+
+    Args:
+        frames (Iterable[Tuple[np.ndarray, np.ndarray]]): ``(glyphs, color_indices)`` grids per frame.
+        palette (np.ndarray): ``(colors, 3)`` RGB colors the indices refer to.
+        shape (Tuple[int, int]): ``(height, width)`` of the grids.
+        frame_rate (int, optional): Frames per second. Defaults to 30.
+        stream (BinaryIO, optional): Terminal to write to, None uses standard output. Defaults to None.
+        status_interval (float, optional): Seconds between updates of the status line, None or 0 hides it. Defaults to 0.5.
+
+    Returns:
+        Dict[str, float]: ``frames``, ``dropped``, ``bytes``, ``bytes_per_frame`` and ``max_frame_bytes``.
+    """
+    stream = stream or sys.stdout.buffer
+    shown_glyphs = np.full(shape, SPACE, dtype=np.uint8)
+    shown_colors = np.full(shape, -1, dtype=np.int64)
+    current_color = -1
+    frame_sizes = []
+    dropped = 0
+    pending = None
+    status_due = 0.0
+
+    def draw(glyphs: np.ndarray, color_indices: np.ndarray) -> None:
+        nonlocal current_color
+        changed = (glyphs != shown_glyphs) | ((color_indices != shown_colors) & (glyphs != SPACE))
+        data, current_color = ansi_delta(glyphs, color_indices, changed, palette, current_color)
+        shown_glyphs[...] = glyphs
+        shown_colors[...] = color_indices
+        stream.write(data)
+        frame_sizes.append(len(data))
+        if status_interval and time.perf_counter() >= status_due:
+            show_status()
+        stream.flush()
+
+    def show_status() -> None:
+        nonlocal status_due
+        recent = frame_sizes[-frame_rate:]
+        status = f"frame {len(frame_sizes)}: {frame_sizes[-1]} bytes, {sum(recent) / len(recent):.0f} bytes per frame over the last second, {dropped} dropped"
+        # below the art in the default color, then back to the art's color so the next frame's bytes stay as they were
+        stream.write(b"\x1b[0m\x1b[%d;1H\x1b[2K" % (shape[0] + 1) + status.encode("ascii"))
+        if current_color >= 0:
+            red, green, blue = (int(value) for value in palette[current_color])
+            stream.write(f"\x1b[38;2;{red};{green};{blue}m".encode("ascii"))
+        status_due = time.perf_counter() + status_interval
+
+    stream.write(b"\x1b[?25l\x1b[2J")  # hide the cursor and clear the screen
+    try:
+        started = time.perf_counter()
+        for index, (glyphs, color_indices) in enumerate(frames):
+            delay = started + index / frame_rate - time.perf_counter()
+            if delay < -1 / frame_rate:
+                # more than a frame behind: skip drawing, the next drawn frame catches up with it
+                dropped += 1
+                pending = (glyphs.copy(), np.array(color_indices, copy=True))
+                continue
+            if delay > 0:
+                time.sleep(delay)
+            draw(glyphs, color_indices)
+            pending = None
+        if pending is not None:
+            draw(*pending)
+            dropped -= 1
+        if status_interval and frame_sizes:
+            show_status()
+    finally:
+        stream.write(b"\x1b[0m\x1b[%d;1H\x1b[?25h" % (shape[0] + (2 if status_interval else 1)))  # reset the color and show the cursor below the art and its status
+        stream.flush()
+
+    total = sum(frame_sizes)
+    return {
+        "frames": len(frame_sizes),
+        "dropped": dropped,
+        "bytes": total,
+        "bytes_per_frame": total / max(len(frame_sizes), 1),
+        "max_frame_bytes": max(frame_sizes, default=0),
+    }
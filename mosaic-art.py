@@ -2,8 +2,9 @@ import argparse
 import io
 
 import matplotlib.pyplot as plt
-import numpy as np
-from PIL import Image, ImageDraw
+from PIL import Image
+
+from fastapi_source.application.ascii.ascii_service import mosaic_image
 
 
 def get_image_from_bytes(byte_contents: bytes) -> Image:
@@ -40,39 +41,7 @@ def get_mosaic_image(input_image: Image, block_size: int = 5) -> Image:
     Returns:
         Image: Output image.
     """
-    # read image in RGBA
-    img = np.array(input_image)
-
-    # get height and width of image
-    height, width, _ = img.shape
-
-    # create an empty image
-    result_img = Image.new("RGBA", (width, height), (0, 0, 0, 0))  # 初始化為完全透明
-    draw = ImageDraw.Draw(result_img)
-
-    # split image "blocks"
-    for y in range(0, height, block_size):
-        for x in range(0, width, block_size):
-            # get a block
-            block = img[y : y + block_size, x : x + block_size]
-
-            # get block color alpha channel
-            alpha_channel = block[:, :, 3]
-
-            # calculate the average of alpha value: avg_alpha
-            avg_alpha = np.mean(alpha_channel)
-
-            if avg_alpha < 50:
-                continue  # nearly transparent
-
-            # calculate the avg_color of this block(only RGB channels)
-            avg_color = np.mean(block[:, :, :3], axis=(0, 1)).astype(int)
-            color = tuple(avg_color) + (255,)  # set alpha to 255
-
-            # draw the block
-            draw.rectangle([x, y, x + block_size, y + block_size], fill=color)
-
-    return result_img
+    return mosaic_image(input_image, block_size)
 
 
 if __name__ == "__main__":
@@ -1,8 +1,23 @@
-import matplotlib.pyplot as plt
 import numpy as np
-from PIL import Image
+from PIL import Image, ImageDraw
 from skimage import color, filters
 
+from edge_sampling import sample_edge_pixels
+
+# Width in inches of the axes area of the matplotlib preview (8 inch figure, default 0.775 subplot width).
+# Point sizes are scatter marker areas in points^2, so a disc spans this share of the output width.
+SCATTER_AXES_INCHES = 8 * 0.775
+
+
+BACKENDS = ("raster", "matplotlib")
+SAMPLINGS = ("uniform", "edges")
+
+
+# Reject an unknown option value instead of silently falling back to a default
+def check_choice(name, value, choices):
+    if value not in choices:
+        raise ValueError(f"{name} must be one of {', '.join(choices)}, got {value!r}")
+
 
 # Load and resize image
 def load_image(image_path, size=(400, 400)):
@@ -20,33 +35,53 @@ def generate_random_points(image, num_points):
     return points
 
 
+# Generate points with a density that follows the edge map, so flat regions need fewer points
+def generate_edge_weighted_points(edges, num_points, edge_bias=0.8):
+    height, width = edges.shape
+
+    # Pick pixels along the edges, then spread each point uniformly inside its pixel
+    pixel = sample_edge_pixels(edges, num_points, edge_bias)
+    points = np.random.rand(num_points, 2)
+    points[:, 0] += pixel % width  # x-coordinates
+    points[:, 1] += pixel // width  # y-coordinates
+    return points
+
+
+# Sepia tone matrix, one row per output channel
+SEPIA_MATRIX = np.array(
+    [
+        [0.393, 0.769, 0.189],
+        [0.349, 0.686, 0.168],
+        [0.272, 0.534, 0.131],
+    ]
+)
+
+
+# Clamp points to pixel indices, the y-axis comes first in image indexing
+def point_indices(points, height, width):
+    x = np.minimum(points[:, 0].astype(np.int64), width - 1)
+    y = np.minimum(points[:, 1].astype(np.int64), height - 1)
+    return y, x
+
+
 # Sample color from the image at each point with random perturbation and subtle sepia tone
 def sample_colors(image, points):
     height, width, _ = image.shape
-    colors = []
-    for point in points:
-        x, y = int(point[0]), int(point[1])
-        x = min(x, width - 1)  # Ensure index within bounds
-        y = min(y, height - 1)
-        color = image[y, x]  # Note that the y-axis comes first in image indexing
-
-        # Add random perturbation to the color
-        perturbation = np.random.randint(-20, 21, size=3)  # Random values between -20 and 20
-        perturbed_color = np.clip(color + perturbation, 0, 255)  # Ensure values are within [0, 255]
-
-        # Apply subtle sepia tone effect
-        tr = int(0.393 * perturbed_color[0] + 0.769 * perturbed_color[1] + 0.189 * perturbed_color[2])
-        tg = int(0.349 * perturbed_color[0] + 0.686 * perturbed_color[1] + 0.168 * perturbed_color[2])
-        tb = int(0.272 * perturbed_color[0] + 0.534 * perturbed_color[1] + 0.131 * perturbed_color[2])
+    y, x = point_indices(points, height, width)
+    colors = image[y, x]
 
-        sepia_color = np.clip([tr, tg, tb], 0, 255)
+    # Add random perturbation to the colors, drawn in one call (same random stream as one draw per point)
+    perturbation = np.random.randint(-20, 21, size=(len(points), 3))  # Random values between -20 and 20
+    perturbed_colors = np.clip(colors + perturbation, 0, 255)  # Ensure values are within [0, 255]
 
-        # Blend the original perturbed color with the sepia color
-        blend_ratio = 0.5  # Adjust this value to control the intensity of the sepia effect
-        blended_color = np.clip((1 - blend_ratio) * perturbed_color + blend_ratio * sepia_color, 0, 255)
+    # Apply subtle sepia tone effect; the products are summed column by column rather than with `@`,
+    # because BLAS may fuse them and move values that sit right on an integer when truncated
+    sepia_colors = perturbed_colors[:, 0, None] * SEPIA_MATRIX[:, 0] + perturbed_colors[:, 1, None] * SEPIA_MATRIX[:, 1] + perturbed_colors[:, 2, None] * SEPIA_MATRIX[:, 2]
+    sepia_colors = np.clip(sepia_colors.astype(np.int64), 0, 255)
 
-        colors.append(blended_color)
-    return np.array(colors)
+    # Blend the original perturbed colors with the sepia colors
+    blend_ratio = 0.5  # Adjust this value to control the intensity of the sepia effect
+    return np.clip((1 - blend_ratio) * perturbed_colors + blend_ratio * sepia_colors, 0, 255)
 
 
 # Detect edges in the image using Sobel filter
@@ -59,81 +94,137 @@ def detect_edges(image):
 # Compute point sizes based on edge proximity
 def compute_point_sizes(points, edges, min_size=1, max_size=50):
     height, width = edges.shape
-    point_sizes = []
-    edge_values = []  # List to collect edge values
 
-    for point in points:
-        x, y = int(point[0]), int(point[1])
-        x = min(x, width - 1)  # Ensure index within bounds
-        y = min(y, height - 1)
-
-        # Higher edge value means the point is near an edge (smaller point size)
-        edge_value = edges[y, x]
-        edge_values.append(edge_value)  # Collect edge value
+    # Higher edge value means the point is near an edge (smaller point size)
+    edge_values = edges[point_indices(points, height, width)]
 
     # Normalize edge values
-    min_edge_value = min(edge_values)
-    max_edge_value = max(edge_values)
+    min_edge_value = edge_values.min()
+    max_edge_value = edge_values.max()
     if max_edge_value != min_edge_value:
-        normalized_edge_values = [(ev - min_edge_value) / (max_edge_value - min_edge_value) for ev in edge_values]
+        normalized_edge_values = (edge_values - min_edge_value) / (max_edge_value - min_edge_value)
     else:
-        normalized_edge_values = [0 for _ in edge_values]  # All values are the same
+        normalized_edge_values = np.zeros_like(edge_values)  # All values are the same
+
+    # Linearly interpolate between min and max size based on normalized edge value
+    return min_size + (1 - normalized_edge_values) * (max_size - min_size)
+
+
+# Rasterize the points as anti-aliased discs, straight into a Pillow canvas
+def render_points(points, colors, point_sizes, image_shape, output_size=(800, 800), supersample=2, tile_size=1024, sort_by_size=False):
+    height, width = image_shape[:2]
+    output_width, output_height = output_size
+
+    # Disc centers and radii in output pixels
+    centers = points * (output_width / width, output_height / height)
+    radii = np.sqrt(point_sizes) / 72 * output_width / SCATTER_AXES_INCHES / 2
+    fills = [tuple(c) + (255,) for c in np.rint(colors).astype(np.uint8).tolist()]
+
+    # Later points are drawn on top; drawing the big discs first keeps the small detail points visible
+    order = np.argsort(-radii, kind="stable") if sort_by_size else np.arange(len(points))
+    left, top = (centers - radii[:, None])[order].T
+    right, bottom = (centers + radii[:, None])[order].T
+
+    canvas = Image.new("RGBA", output_size, (0, 0, 0, 0))
+    for tile_y in range(0, output_height, tile_size):
+        for tile_x in range(0, output_width, tile_size):
+            tile_width = min(tile_size, output_width - tile_x)
+            tile_height = min(tile_size, output_height - tile_y)
+            visible = np.flatnonzero((right >= tile_x) & (left < tile_x + tile_width) & (bottom >= tile_y) & (top < tile_y + tile_height))
+            if not len(visible):
+                continue
+
+            # Draw the tile enlarged and shrink it with a box filter, which anti-aliases the disc edges
+            tile = Image.new("RGBA", (tile_width * supersample, tile_height * supersample), (0, 0, 0, 0))
+            draw = ImageDraw.Draw(tile)
+            boxes = np.stack([left[visible] - tile_x, top[visible] - tile_y, right[visible] - tile_x, bottom[visible] - tile_y], axis=1) * supersample
+            for box, index in zip(boxes.tolist(), order[visible].tolist()):
+                draw.ellipse(box, fill=fills[index])
+            canvas.paste(tile.resize((tile_width, tile_height), Image.Resampling.BOX), (tile_x, tile_y))
+    return canvas
+
+
+# Plot the points with matplotlib, kept as a preview of the raster output
+def plot_points(points, colors, point_sizes, output_path=None):
+    import matplotlib.pyplot as plt
 
-    for i, _ in enumerate(points):
-        normalized_edge_value = normalized_edge_values[i]
+    plt.figure(figsize=(8, 8))
+    plt.scatter(points[:, 0], points[:, 1], c=colors / 255, s=point_sizes, edgecolor="none")
+    plt.gca().invert_yaxis()  # Match the image's coordinate system
+    plt.axis("off")  # Hide axis
 
-        # Linearly interpolate between min and max size based on normalized edge value
-        point_size = min_size + (1 - normalized_edge_value) * (max_size - min_size)
-        point_sizes.append(point_size)
+    if output_path:
+        # Save the plot as an image file
+        plt.savefig(output_path, bbox_inches="tight", pad_inches=0, facecolor=(0.5, 0.5, 0.5, 0.0))
+        plt.close()
+    else:
+        # Show the plot
+        plt.show()
 
-    return np.array(point_sizes)
 
+# Create the pointillism image with edge-aware point sizes
+def create_pointillism_art(image_path, output_path=None, num_points=50000, min_size=1, max_size=50, output_size=(800, 800), backend="raster", sort_by_size=False, sampling="uniform"):
+    check_choice("backend", backend, BACKENDS)
+    check_choice("sampling", sampling, SAMPLINGS)
 
-# Plot the pointillism image with edge-aware point sizes
-def create_pointillism_art(image_path, output_path=None, num_points=50000, min_size=1, max_size=50):
     # Load image
     img = load_image(image_path)
 
-    # Generate random points
-    points = generate_random_points(img, num_points)
+    # Detect edges in the image
+    edges = detect_edges(img)
+
+    # Generate random points, either uniformly or concentrated along the edges
+    points = generate_edge_weighted_points(edges, num_points) if sampling == "edges" else generate_random_points(img, num_points)
 
     # Sample colors from the image based on points
     colors = sample_colors(img, points)
 
-    # Detect edges in the image
-    edges = detect_edges(img)
-
     # Compute point sizes based on proximity to edges
     point_sizes = compute_point_sizes(points, edges, min_size, max_size)
 
-    # Plot the points with sampled colors and dynamic sizes
-    plt.figure(figsize=(8, 8))
-    plt.scatter(points[:, 0], points[:, 1], c=colors / 255, s=point_sizes, edgecolor="none")
-    plt.gca().invert_yaxis()  # Match the image's coordinate system
-    plt.axis("off")  # Hide axis
+    if backend == "matplotlib":
+        plot_points(points, colors, point_sizes, output_path)
+        return
+
+    # Draw the points with sampled colors and dynamic sizes
+    result_img = render_points(points, colors, point_sizes, img.shape, output_size, sort_by_size=sort_by_size)
 
     if output_path:
-        # Save the plot as an image file
-        plt.savefig(output_path, bbox_inches="tight", pad_inches=0, facecolor=(0.5, 0.5, 0.5, 0.0))
-        plt.close()
+        result_img.save(output_path, "PNG")
     else:
-        # Show the plot
+        import matplotlib.pyplot as plt
+
+        plt.imshow(result_img)
+        plt.axis("off")
         plt.show()
 
 
 if __name__ == "__main__":
     import sys
 
+    usage = f"Usage: python3 pointillism-art.py <input_image> [output_image] [output_width] [{'|'.join(SAMPLINGS)}]"
+    if len(sys.argv) < 2:
+        print(usage)
+        sys.exit(1)
+
     image_file_path: str = sys.argv[1]
     print(image_file_path)
 
     if len(sys.argv) == 2:
         create_pointillism_art(image_file_path)
-    elif len(sys.argv) == 3:
+    elif len(sys.argv) >= 3:
         output_file_path = sys.argv[2]
-        create_pointillism_art(image_file_path, output_file_path)
+        output_width = int(sys.argv[3]) if len(sys.argv) >= 4 else 800
+        sampling = sys.argv[4] if len(sys.argv) >= 5 else "uniform"
+        if sampling not in SAMPLINGS:
+            print(f"Unknown sampling: {sampling}")
+            print(usage)
+            sys.exit(1)
+        create_pointillism_art(image_file_path, output_file_path, output_size=(output_width, output_width), sampling=sampling)
         print("Pointillism image file path: ", output_file_path)
 
 # Example usage:
 # python3 pointillism-art.py example/ztm-logo.png
 # python3 pointillism-art.py example/ztm-logo.png pointillism-art.png
+# python3 pointillism-art.py example/ztm-logo.png pointillism-art.png 4000
+# python3 pointillism-art.py example/ztm-logo.png pointillism-art.png 800 edges
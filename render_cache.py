@@ -0,0 +1,242 @@
+import hashlib
+import json
+import os
+import threading
+from typing import Any, BinaryIO, Dict, Iterable, Iterator, Optional, Union
+
+from cachetools import LRUCache
+
+
+def canonical_params(params: Dict[str, Any]) -> str:
+    """Serialize render parameters so equal settings always give the same string.
+
+    Args:
+        params (Dict[str, Any]): Render parameters, e.g. width, pattern, theme and filters.
+
+    Returns:
+        str: Sorted, whitespace-free JSON with every number written as a float (``1`` and ``1.0`` agree).
+    """
+    # ints become floats too, so the two spellings of one number agree; bools are ints in Python but stay bools
+    normalized = {name: float(value) if isinstance(value, (int, float)) and not isinstance(value, bool) else value for name, value in params.items()}
+    return json.dumps(normalized, sort_keys=True, separators=(",", ":"))
+
+
+def content_hash(source: Union[bytes, BinaryIO]) -> str:
+    """SHA-256 of encoded image bytes, read in chunks when they come as a file.
+
+    Args:
+        source (Union[bytes, BinaryIO]): Image bytes, or a seekable file holding them; its position is kept.
+
+    Returns:
+        str: Hex digest.
+    """
+    if isinstance(source, (bytes, bytearray, memoryview)):
+        return hashlib.sha256(source).hexdigest()
+    position = source.tell()
+    source.seek(0)
+    digest = hashlib.sha256()
+    for chunk in iter(lambda: source.read(2**16), b""):
+        digest.update(chunk)
+    source.seek(position)
+    return digest.hexdigest()
+
+
+class RenderCache:
+    """Content-addressed cache of finished renders.
+
+    Entries are keyed by the hash of the source image bytes plus the hash of
+    the canonical render parameters. A size-bounded in-memory LRU tier sits in
+    front of an optional on-disk tier that evicts its least recently used
+    files once it grows past ``max_disk_bytes``.
+    """
+
+    def __init__(self, max_memory_bytes: int = 64 * 2**20, disk_dir: Optional[str] = None, max_disk_bytes: int = 512 * 2**20, max_entry_bytes: int = 8 * 2**20):
+        """Create the cache tiers.
+
+        Args:
+            max_memory_bytes (int, optional): Total size of the in-memory tier. Defaults to 64 MiB.
+            disk_dir (str, optional): Directory of the on-disk tier, None keeps the cache in memory only. Defaults to None.
+            max_disk_bytes (int, optional): Total size of the on-disk tier. Defaults to 512 MiB.
+            max_entry_bytes (int, optional): Larger renders are not cached. Defaults to 8 MiB.
+        """
+        self.memory = LRUCache(maxsize=max_memory_bytes, getsizeof=len)
+        self.disk_dir = disk_dir
+        self.max_disk_bytes = max_disk_bytes
+        self.max_entry_bytes = max_entry_bytes
+        self.counters = {"hits": 0, "memory_hits": 0, "disk_hits": 0, "misses": 0, "stores": 0, "disk_evictions": 0}
+        self._lock = threading.Lock()
+        self._disk_bytes = 0
+        if disk_dir:
+            os.makedirs(disk_dir, exist_ok=True)
+            self._disk_bytes = sum(os.path.getsize(path) for path in self._disk_files())
+
+    @staticmethod
+    def key(kind: str, image_bytes: Union[bytes, BinaryIO], params: Dict[str, Any]) -> str:
+        """Build the cache key of a render.
+
+        Args:
+            kind (str): Kind of render, e.g. "text", "html" or "mosaic".
+            image_bytes (Union[bytes, BinaryIO]): Encoded source image, or a seekable file holding it.
+            params (Dict[str, Any]): Every parameter that changes the render.
+
+        Returns:
+            str: ``<kind>-<image sha256>-<params sha256>``.
+        """
+        image_hash = content_hash(image_bytes)
+        params_hash = hashlib.sha256(canonical_params(params).encode("utf-8")).hexdigest()
+        return f"{kind}-{image_hash}-{params_hash}"
+
+    def get(self, key: str) -> Optional[bytes]:
+        """Look a render up in memory, then on disk.
+
+        Args:
+            key (str): Key from ``RenderCache.key``.
+
+        Returns:
+            Optional[bytes]: The cached render, or None on a miss.
+        """
+        with self._lock:
+            value = self.memory.get(key)
+            if value is not None:
+                self.counters["hits"] += 1
+                self.counters["memory_hits"] += 1
+                return value
+
+            path = self._disk_path(key)
+            if path and os.path.exists(path):
+                try:
+                    with open(path, "rb") as f:
+                        value = f.read()
+                    os.utime(path)  # mtime doubles as the last-used time for eviction
+                except OSError:
+                    value = None
+                if value is not None:
+                    self.counters["hits"] += 1
+                    self.counters["disk_hits"] += 1
+                    self._remember(key, value)
+                    return value
+
+            self.counters["misses"] += 1
+            return None
+
+    def set(self, key: str, value: bytes) -> None:
+        """Store a render in both tiers, unless it is larger than ``max_entry_bytes``.
+
+        Args:
+            key (str): Key from ``RenderCache.key``.
+            value (bytes): The finished render.
+        """
+        if len(value) > self.max_entry_bytes:
+            return
+        with self._lock:
+            self.counters["stores"] += 1
+            self._remember(key, value)
+            path = self._disk_path(key)
+            if path:
+                os.makedirs(os.path.dirname(path), exist_ok=True)
+                previous = os.path.getsize(path) if os.path.exists(path) else 0
+                partial_path = f"{path}.{threading.get_ident()}.part"
+                with open(partial_path, "wb") as f:
+                    f.write(value)
+                os.replace(partial_path, path)
+                self._disk_bytes += len(value) - previous
+                self._evict_disk()
+
+    def collect_lines(self, key: str, lines: Iterable[str]) -> Iterator[str]:
+        """Pass lines of a streamed text render through and cache the joined text at the end.
+
+        Collecting stops once the text outgrows ``max_entry_bytes``, so huge
+        renders keep streaming in constant memory and are simply not cached.
+
+        Args:
+            key (str): Key from ``RenderCache.key``.
+            lines (Iterable[str]): Lines of the render, without newlines.
+
+        Yields:
+            str: The same lines.
+        """
+        yield from self._collect(key, lines, "\n")
+
+    def collect_chunks(self, key: str, chunks: Iterable[str]) -> Iterator[str]:
+        """Pass pieces of a streamed render through and cache their concatenation at the end.
+
+        Like ``collect_lines``, but the pieces are joined without a separator.
+
+        Args:
+            key (str): Key from ``RenderCache.key``.
+            chunks (Iterable[str]): Consecutive pieces of the render.
+
+        Yields:
+            str: The same pieces.
+        """
+        yield from self._collect(key, chunks, "")
+
+    def _collect(self, key: str, pieces: Iterable[str], separator: str) -> Iterator[str]:
+        # pieces are kept encoded, so the limit counts UTF-8 bytes: glyphs like "▓" or emoji take 3-4 bytes each
+        collected, size, separator_bytes = [], 0, separator.encode("utf-8")
+        for piece in pieces:
+            if collected is not None:
+                data = piece.encode("utf-8")
+                size += len(data) + len(separator_bytes)
+                if size > self.max_entry_bytes:
+                    collected = None
+                else:
+                    collected.append(data)
+            yield piece
+        if collected is not None:
+            self.set(key, separator_bytes.join(collected))
+
+    def stats(self) -> Dict[str, int]:
+        """Hit/miss counters and current tier sizes.
+
+        Returns:
+            Dict[str, int]: Counters plus ``memory_bytes``, ``memory_entries`` and ``disk_bytes``.
+        """
+        with self._lock:
+            return {
+                **self.counters,
+                "memory_bytes": int(self.memory.currsize),
+                "memory_entries": len(self.memory),
+                "disk_bytes": self._disk_bytes,
+            }
+
+    def _remember(self, key: str, value: bytes) -> None:
+        if len(value) <= self.memory.maxsize:
+            self.memory[key] = value
+
+    def _disk_path(self, key: str) -> Optional[str]:
+        if not self.disk_dir:
+            return None
+        image_hash = key.split("-")[1]
+        return os.path.join(self.disk_dir, image_hash[:2], key)
+
+    def _disk_files(self) -> Iterator[str]:
+        for root, _, names in os.walk(self.disk_dir):
+            for name in names:
+                if not name.endswith(".part"):
+                    yield os.path.join(root, name)
+
+    def _evict_disk(self) -> None:
+        if self._disk_bytes <= self.max_disk_bytes:
+            return
+        entries = []
+        for path in self._disk_files():
+            try:
+                stat = os.stat(path)
+            except OSError:
+                continue
+            entries.append((stat.st_mtime, stat.st_size, path))
+        self._disk_bytes = sum(size for _, size, _ in entries)
+        for _, size, path in sorted(entries):
+            if self._disk_bytes <= self.max_disk_bytes:
+                break
+            try:
+                os.remove(path)
+            except OSError:
+                continue
+            self._disk_bytes -= size
+            self.counters["disk_evictions"] += 1
+
+
+# the cache of the API routes and of the CLI, sized from the environment
+render_cache = RenderCache(int(os.getenv("ASCII_ART_CACHE_MEMORY_BYTES", 64 * 2**20)), os.getenv("ASCII_ART_CACHE_DIR") or None, int(os.getenv("ASCII_ART_CACHE_DISK_BYTES", 512 * 2**20)))
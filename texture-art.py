@@ -1,9 +1,14 @@
 import argparse
+import functools
+import hashlib
 import io
 import os
 import random
+from typing import Optional, Tuple, Union
 
 import matplotlib.pyplot as plt
+import numpy as np
+from cachetools import LRUCache
 from PIL import Image
 
 
@@ -31,80 +36,176 @@ def get_image_from_path(image_path: str) -> Image:
     return Image.open(image_path).convert("RGBA")
 
 
-def get_random_texture_path(folder_path: str) -> str:
-    """_summary_
+def fit_cover_texture(texture_image: Image, size: Tuple[int, int]) -> Image:
+    """Scale a texture to cover the given size and crop it around its center (object-fit: cover).
+
+    Args:
+        texture_image (Image): Texture image
+        size (Tuple[int, int]): Width and height to cover
+
+    Returns:
+        Image: Texture of exactly the given size.
+    """
+    # get width and height of the target and texture images
+    input_width, input_height = size
+    texture_width, texture_height = texture_image.size
+
+    # calculate the scaling factor to ensure the texture covers the input image (object-fit: cover effect)
+    scale = max(input_width / texture_width, input_height / texture_height)
+    new_texture_size = (int(texture_width * scale), int(texture_height * scale))
+
+    # resize the texture image, maintaining the aspect ratio to cover the input image
+    texture_img_resized = texture_image.resize(new_texture_size, Image.Resampling.LANCZOS)
+
+    # calculate the area to crop from the texture to center it
+    crop_x = (new_texture_size[0] - input_width) // 2
+    crop_y = (new_texture_size[1] - input_height) // 2
+    return texture_img_resized.crop((crop_x, crop_y, crop_x + input_width, crop_y + input_height))
+
+
+class TextureLibrary:
+    """Texture folder indexed once, with decoded and fit-cover textures kept in a bounded LRU.
+
+    Fit-cover textures can also be written to ``cache_dir`` as .npy files,
+    which later runs memory-map instead of resizing the texture again.
+    """
+
+    def __init__(self, folder_path: str, max_memory_bytes: int = 256 * 2**20, cache_dir: Optional[str] = None):
+        """Index the folder.
+
+        Args:
+            folder_path (str): The folder where to find images(only jpg)
+            max_memory_bytes (int, optional): Total size of the decoded textures kept in memory. Defaults to 256 MiB.
+            cache_dir (str, optional): Directory for .npy copies of fit-cover textures, None disables them. Defaults to None.
+        """
+        self.folder_path = folder_path
+        self.paths = [os.path.join(folder_path, f) for f in os.listdir(folder_path) if f.endswith(".jpg")] if os.path.isdir(folder_path) else []
+        self.cache_dir = cache_dir
+        self.memory = LRUCache(maxsize=max_memory_bytes, getsizeof=lambda image: image.width * image.height * len(image.getbands()))
+
+    def random_texture_path(self) -> Optional[str]:
+        """Pick a random texture of the folder.
+
+        Returns:
+            Optional[str]: Full path of a selected image, None if the folder has no jpg.
+        """
+        return random.choice(self.paths) if self.paths else None
+
+    def texture(self, texture_path: str) -> Image:
+        """Decode a texture once and keep it in memory.
+
+        Args:
+            texture_path (str): Path of the texture image.
+
+        Returns:
+            Image: The texture in RGBA.
+        """
+        key = (texture_path, None)
+        image = self.memory.get(key)
+        if image is None:
+            image = get_image_from_path(texture_path)
+            self._remember(key, image)
+        return image
+
+    def fit_cover(self, texture_path: str, size: Tuple[int, int]) -> Image:
+        """Texture scaled and cropped to cover ``size``, from memory, the .npy cache or a fresh resize.
+
+        Args:
+            texture_path (str): Path of the texture image.
+            size (Tuple[int, int]): Width and height to cover.
+
+        Returns:
+            Image: RGBA texture of exactly the given size.
+        """
+        key = (texture_path, tuple(size))
+        image = self.memory.get(key)
+        if image is not None:
+            return image
+
+        npy_path = self._npy_path(texture_path, size)
+        if npy_path and os.path.exists(npy_path):
+            image = Image.fromarray(np.load(npy_path, mmap_mode="r"), "RGBA")
+        else:
+            image = fit_cover_texture(self.texture(texture_path), size).convert("RGBA")
+            if npy_path:
+                os.makedirs(self.cache_dir, exist_ok=True)
+                partial_path = f"{npy_path}.{os.getpid()}.part"
+                with open(partial_path, "wb") as f:
+                    np.save(f, np.asarray(image))
+                os.replace(partial_path, npy_path)
+        self._remember(key, image)
+        return image
+
+    def _remember(self, key: tuple, image: Image) -> None:
+        if self.memory.getsizeof(image) <= self.memory.maxsize:
+            self.memory[key] = image
+
+    def _npy_path(self, texture_path: str, size: Tuple[int, int]) -> Optional[str]:
+        if not self.cache_dir:
+            return None
+        # the file's size and mtime are part of the name, so an edited texture is resized again
+        stat = os.stat(texture_path)
+        source = f"{os.path.abspath(texture_path)}:{stat.st_size}:{stat.st_mtime_ns}"
+        digest = hashlib.sha256(source.encode("utf-8")).hexdigest()[:16]
+        return os.path.join(self.cache_dir, f"{digest}-{size[0]}x{size[1]}.npy")
+
+
+@functools.lru_cache(maxsize=None)
+def get_texture_library(folder_path: str, cache_dir: Optional[str] = None) -> TextureLibrary:
+    """Shared library of a texture folder, so the folder is listed only once per process.
 
     Args:
         folder_path (str): The folder where to find images(only jpg)
+        cache_dir (str, optional): Directory for .npy copies of fit-cover textures. Defaults to None.
 
     Returns:
-        str: Full path of a selected image
+        TextureLibrary: The folder's texture library.
     """
-    # get all .jpg files in the folder
-    jpg_files = [f for f in os.listdir(folder_path) if f.endswith(".jpg")]
+    return TextureLibrary(folder_path, cache_dir=cache_dir)
+
 
-    if not jpg_files:
-        return None
+def get_random_texture_path(folder_path: str) -> str:
+    """_summary_
 
-    # randomly select a .jpg file
-    file = random.choice(jpg_files)
+    Args:
+        folder_path (str): The folder where to find images(only jpg)
 
-    # return full path
-    return os.path.join(folder_path, file)
+    Returns:
+        str: Full path of a selected image
+    """
+    return get_texture_library(folder_path).random_texture_path()
 
 
-def apply_texture_with_fit_cover(input_image: Image, texture_image: Image, alpha_threshold=128) -> Image:
+def apply_texture_with_fit_cover(input_image: Image, texture_image: Union[Image.Image, str], alpha_threshold=128, library: Optional[TextureLibrary] = None) -> Image:
     """_summary_
 
     Args:
         input_image (Image): Input image
-        texture_image (Image): Texture image
+        texture_image (Image | str): Texture image, or the path of a texture to load through the texture library
         alpha_threshold (int, optional): The alpha value threshold (0-255).
                                Only areas with an alpha value higher than this threshold
                                will receive the texture. Default is 128.
                                - 0 means fully transparent areas are affected.
                                - 255 means only fully opaque areas are affected
                                - Defaults to 128.
+        library (TextureLibrary, optional): Library that caches texture paths. Defaults to the library of the texture's folder.
 
     Returns:
         Image: Output image.
     """
-    # get width and height of the input and texture images
     input_width, input_height = input_image.size
-    texture_width, texture_height = texture_image.size
 
-    # calculate the scaling factor to ensure the texture covers the input image (object-fit: cover effect)
-    scale = max(input_width / texture_width, input_height / texture_height)
-    new_texture_size = (int(texture_width * scale), int(texture_height * scale))
-
-    # resize the texture image, maintaining the aspect ratio to cover the input image
-    texture_img_resized = texture_image.resize(new_texture_size, Image.Resampling.LANCZOS)
+    # texture paths go through the library, so repeated sizes reuse the scaled and cropped texture
+    if isinstance(texture_image, str):
+        library = library or get_texture_library(os.path.dirname(texture_image))
+        texture_img_cropped = library.fit_cover(texture_image, input_image.size)
+    else:
+        texture_img_cropped = fit_cover_texture(texture_image, input_image.size)
 
-    # calculate the area to crop from the texture to center it
-    crop_x = (new_texture_size[0] - input_width) // 2
-    crop_y = (new_texture_size[1] - input_height) // 2
-    texture_img_cropped = texture_img_resized.crop((crop_x, crop_y, crop_x + input_width, crop_y + input_height))
-
-    # extract the alpha channel from the input image
-    input_alpha = input_image.split()[3]
-
-    # create an empty image
-    result_img = Image.new("RGBA", (input_width, input_height), (0, 0, 0, 0))
-
-    # iterate over each pixel, applying the texture based on the alpha channel
-    for y in range(input_height):
-        for x in range(input_width):
-            # get current pixel's alpha value
-            alpha_value = input_alpha.getpixel((x, y))
-
-            # apply the texture if the alpha value exceeds the threshold
-            if alpha_value > alpha_threshold:
-                # use the pixel from the texture image
-                texture_pixel = texture_img_cropped.getpixel((x, y))
-                result_img.putpixel((x, y), texture_pixel)
-            else:
-                # retain the original transparency or make it fully transparent
-                result_img.putpixel((x, y), (0, 0, 0, 0))
+    # keep the texture where the input alpha exceeds the threshold, fully transparent elsewhere
+    mask = input_image.getchannel("A").point(lambda alpha: 255 if alpha > alpha_threshold else 0)
+    transparent = Image.new("RGBA", (input_width, input_height), (0, 0, 0, 0))
+    result_img = Image.composite(texture_img_cropped.convert("RGBA"), transparent, mask)
     return result_img
 
 
@@ -114,7 +215,8 @@ if __name__ == "__main__":
     parser.add_argument("--input_image", "-i", type=str, help="Path to the input image.")
     parser.add_argument("--texture_image", "-t", type=str, help="Path to the texture image.", default=None)
     parser.add_argument("--output", "-o", type=str, help="Path to save the output image. (default value: None, and it will 'Show')", default=None)
-    # parser.add_argument("--alpha_threshold", "-a", type=int, help="The alpha value threshold (0-255)", default=128)
+    parser.add_argument("--texture_cache_dir", type=str, help="Directory to keep scaled textures in as .npy files between runs. (default value: None)", default=None)
+    parser.add_argument("--alpha_threshold", "-a", type=int, help="The alpha value threshold (0-255), only areas above it receive the texture.", default=128)
 
     args = parser.parse_args()
 
@@ -129,13 +231,12 @@ if __name__ == "__main__":
 
     # check 'texture_image' argument
     # if texture_image is None, select a random texture from somewhere
+    texture_path = args.texture_image or "texture-art-source/"
+    library = get_texture_library(os.path.dirname(texture_path), args.texture_cache_dir)
     if args.texture_image is None:
-        random_texture_path = get_random_texture_path("texture-art-source")
-        texture_img = get_image_from_path(random_texture_path)
-    else:
-        texture_img = get_image_from_path(args.texture_image)
+        texture_path = library.random_texture_path()
 
-    result_img = apply_texture_with_fit_cover(original_img, texture_img)
+    result_img = apply_texture_with_fit_cover(original_img, texture_path, args.alpha_threshold, library)
 
     if args.output:
         result_img.save(args.output, "PNG")
@@ -148,3 +249,4 @@ if __name__ == "__main__":
 # 1. python3 texture-art.py -i example/ztm-logo.png
 # 2. python3 texture-art.py -i example/ztm-logo.png -t your/own/texture/path
 # 3. python3 texture-art.py -i example/ztm-logo.png -o texture-art.png
+# 4. python3 texture-art.py -i example/ztm-logo.png -a 200